@@ -0,0 +1,247 @@
+"""Background extraction jobs: deadline, retries, hedged requests and cancel"""
+
+import contextvars
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional
+
+from extractor import TRANSIENT_ERRORS, ExtractionError, FieldExtractor, retry_delay
+from metrics import REGISTRY
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed_out"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED, TIMED_OUT)
+
+# How often a waiting job wakes up to check for cancel and the deadline
+POLL_INTERVAL = 0.1
+
+
+class JobCancelled(Exception):
+    """Raised inside a running request when its job has been cancelled"""
+
+
+class JobTimedOut(Exception):
+    """Raised when a job runs past its deadline"""
+
+
+class ExtractionJob:
+    """State of one background extraction, safe to read from the script thread.
+
+    Streamed fields collect in ``partial_fields`` while the job runs; once
+    it has finished ``result`` holds the extraction result (or the partial
+    one on failure) and ``error`` the reason it failed.
+    """
+
+    def __init__(
+        self, prompt: str, stream: bool, deadline_s: float, current_values: Optional[Dict[str, Any]] = None
+    ):
+        self.id = uuid.uuid4().hex[:12]
+        self.prompt = prompt
+        self.stream = stream
+        # Set for follow-ups: the job then returns only the fields the prompt changes
+        self.current_values = current_values
+        self.deadline_s = deadline_s
+        self.status = PENDING
+        self.partial_fields: Dict[str, Any] = {}
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.hedged = False
+        self.submitted_at = time.monotonic()
+        self.first_field_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Ask the job to stop; it finishes as cancelled at its next check"""
+        self._cancel.set()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Consistent copy of the job state for rendering"""
+        with self._lock:
+            now = self.finished_at or time.monotonic()
+            return {
+                "id": self.id,
+                "status": self.status,
+                "partial_fields": dict(self.partial_fields),
+                "result": self.result,
+                "error": self.error,
+                "attempts": self.attempts,
+                "hedged": self.hedged,
+                "elapsed_s": now - self.submitted_at,
+                "first_field_s": None if self.first_field_at is None else self.first_field_at - self.submitted_at,
+            }
+
+    def on_field(self, field_name: str, value: Any):
+        """Streaming callback; raising here aborts a cancelled request mid-stream"""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        with self._lock:
+            if self.status in FINISHED:
+                return
+            if self.first_field_at is None:
+                self.first_field_at = time.monotonic()
+            self.partial_fields[field_name] = value
+
+    def _start_attempt(self):
+        with self._lock:
+            self.status = RUNNING
+            self.attempts += 1
+
+    def _finish(self, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        with self._lock:
+            if self.status in FINISHED:
+                return
+            if result is None:
+                result = {"supported_fields": dict(self.partial_fields), "unsupported_fields": []}
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.monotonic()
+        REGISTRY.observe("ai_job", self.finished_at - self.submitted_at, status=status)
+
+
+class JobRunner:
+    """Runs extraction jobs on a shared thread pool.
+
+    Each job gets a coordinator thread that issues the request on a second
+    pool, so it can keep checking for cancel and the deadline while the
+    request is in flight, launch a hedged duplicate when the first one is
+    slow, and retry transient API errors with exponential backoff.
+
+    A request that is already on the wire cannot be interrupted; when a job
+    is cancelled or times out its result is discarded, and the request
+    itself is bounded by the remaining deadline passed as its timeout.
+    """
+
+    def __init__(self, max_workers: int = 8):
+        self._coordinators = ThreadPoolExecutor(max_workers, thread_name_prefix="ai-job")
+        # Room for a hedged request next to every primary one
+        self._requests = ThreadPoolExecutor(max_workers * 2, thread_name_prefix="ai-request")
+
+    def submit(
+        self,
+        extractor: FieldExtractor,
+        prompt: str,
+        stream: bool = True,
+        deadline_s: float = 90.0,
+        max_attempts: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 10.0,
+        hedge_after_s: float = 0.0,
+        current_values: Optional[Dict[str, Any]] = None,
+    ) -> ExtractionJob:
+        """Queue an extraction and return its job immediately.
+
+        ``hedge_after_s`` > 0 sends a second, non-streaming request when the
+        first one has not finished after that many seconds; whichever
+        succeeds first wins. With ``current_values`` the prompt is a
+        follow-up and the job runs ``FieldExtractor.extract_delta``.
+        """
+        job = ExtractionJob(prompt, stream, deadline_s, current_values)
+        # Run in a copy of the caller's context, so spans land in the session's recent timings
+        self._coordinators.submit(
+            contextvars.copy_context().run,
+            self._run, job, extractor, max_attempts, base_delay, max_delay, hedge_after_s,
+        )
+        return job
+
+    def shutdown(self):
+        self._coordinators.shutdown(wait=False, cancel_futures=True)
+        self._requests.shutdown(wait=False, cancel_futures=True)
+
+    def _run(
+        self,
+        job: ExtractionJob,
+        extractor: FieldExtractor,
+        max_attempts: int,
+        base_delay: float,
+        max_delay: float,
+        hedge_after_s: float,
+    ):
+        deadline = job.submitted_at + job.deadline_s
+        try:
+            while True:
+                if job.cancel_requested:
+                    raise JobCancelled()
+                job._start_attempt()
+                try:
+                    job._finish(SUCCEEDED, self._attempt(job, extractor, deadline, hedge_after_s))
+                    return
+                except ExtractionError as e:
+                    cause = e.__cause__
+                    if isinstance(cause, (JobCancelled, JobTimedOut)):
+                        raise cause
+                    if not isinstance(cause, TRANSIENT_ERRORS) or job.attempts >= max_attempts:
+                        job._finish(FAILED, self._partial(job, e.partial), str(e))
+                        return
+                    delay = retry_delay(cause, job.attempts, base_delay, max_delay)
+                    if time.monotonic() + delay >= deadline:
+                        raise JobTimedOut()
+                    if job._cancel.wait(delay):
+                        raise JobCancelled()
+        except JobCancelled:
+            job._finish(CANCELLED, error="Cancelled")
+        except JobTimedOut:
+            job._finish(TIMED_OUT, error=f"No result within {job.deadline_s:g}s")
+        except Exception as e:
+            job._finish(FAILED, error=str(e))
+
+    def _attempt(
+        self, job: ExtractionJob, extractor: FieldExtractor, deadline: float, hedge_after_s: float
+    ) -> Dict[str, Any]:
+        """One attempt: the primary request plus an optional hedged duplicate"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise JobTimedOut()
+        on_field = job.on_field if job.stream else None
+        pending = {self._submit_request(extractor, job, on_field, remaining)}
+        hedge_at = time.monotonic() + hedge_after_s if hedge_after_s > 0 else None
+        error: Optional[BaseException] = None
+
+        while pending:
+            done, pending = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            if job.cancel_requested:
+                raise JobCancelled()
+            now = time.monotonic()
+            if now >= deadline:
+                raise JobTimedOut()
+            if pending and hedge_at is not None and now >= hedge_at and not job.hedged:
+                job.hedged = True
+                pending.add(self._submit_request(extractor, job, None, deadline - now))
+
+        raise error
+
+    def _submit_request(self, extractor: FieldExtractor, job: ExtractionJob, on_field, timeout: float):
+        run = contextvars.copy_context().run
+        if job.current_values is not None:
+            return self._requests.submit(
+                run, extractor.extract_delta, job.prompt, job.current_values, on_field, timeout
+            )
+        return self._requests.submit(run, extractor.extract, job.prompt, on_field, timeout)
+
+    @staticmethod
+    def _partial(job: ExtractionJob, partial: Dict[str, Any]) -> Dict[str, Any]:
+        """Fields known so far: the extractor's partial result plus anything streamed"""
+        with job._lock:
+            fields = {**job.partial_fields, **partial.get("supported_fields", {})}
+        return {"supported_fields": fields, "unsupported_fields": partial.get("unsupported_fields", [])}
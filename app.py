@@ -1,9 +1,26 @@
 import streamlit as st
-import openai
-import json
+import functools
+import io
 import os
-from datetime import datetime, date, time
-from typing import Dict, Any, List
+import tempfile
+from datetime import date, datetime, time
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
+
+from field_coercion import CompiledField, coerce_fields
+from field_schemas import SCHEMA_PATH
+from field_validation import validate_value
+from form_schema import FormSchema, PageSpec, SchemaSource
+from metrics import REGISTRY, bind_recent, new_recent, start_file_exporter, start_http_exporter
+from model_tiers import tier_report
+from response_cache import ResponseCache
+from submission_store import SubmissionStore
+
+if TYPE_CHECKING:
+    # Imported on first AI use instead: the openai SDK takes longer to import than the rest of the app
+    from ai_jobs import ExtractionJob, JobRunner
+    from extractor import FieldExtractor
+    from prompt_index import PromptIndex
+    from rule_extractor import RuleExtractor
 
 # Set page config
 st.set_page_config(
@@ -26,46 +43,16 @@ def init_session_state():
     
     if 'ai_processed' not in st.session_state:
         st.session_state.ai_processed = False
-
-# Define field schemas for all pages
-FIELD_SCHEMAS = {
-    "page_1": {
-        "program_name": {"type": "text", "label": "Program Name"},
-        "program_code": {"type": "text", "label": "Program Code"},
-        "launch_date": {"type": "date", "label": "Launch Date"},
-        "program_budget": {"type": "number", "label": "Program Budget ($)"},
-        "program_status": {"type": "select", "label": "Program Status", "options": ["Draft", "Active", "Inactive", "Suspended"]},
-        "target_audience": {"type": "multiselect", "label": "Target Audience", "options": ["New Customers", "Existing Customers", "Premium Customers", "Corporate Clients"]},
-        "program_duration": {"type": "slider", "label": "Program Duration (months)", "min": 1, "max": 24},
-        "auto_renewal": {"type": "checkbox", "label": "Auto Renewal Enabled"},
-        "launch_time": {"type": "time", "label": "Launch Time"},
-        "program_description": {"type": "textarea", "label": "Program Description"}
-    },
-    "page_2": {
-        "product_type": {"type": "radio", "label": "Product Type", "options": ["Standard Card", "Gold Card", "Platinum Card", "Business Card"]},
-        "annual_fee": {"type": "number", "label": "Annual Fee ($)"},
-        "credit_limit": {"type": "select", "label": "Credit Limit", "options": ["$1,000", "$5,000", "$10,000", "$25,000", "$50,000", "Unlimited"]},
-        "interest_rate": {"type": "slider", "label": "Interest Rate (%)", "min": 0.0, "max": 30.0, "step": 0.1},
-        "rewards_program": {"type": "multiselect", "label": "Rewards Program", "options": ["Cash Back", "Points", "Miles", "Discounts"]},
-        "card_features": {"type": "multiselect", "label": "Card Features", "options": ["Contactless", "Chip & PIN", "Mobile Wallet", "Travel Insurance", "Purchase Protection"]},
-        "activation_required": {"type": "checkbox", "label": "Activation Required"},
-        "card_design": {"type": "text", "label": "Card Design Theme"},
-        "welcome_bonus": {"type": "number", "label": "Welcome Bonus ($)"},
-        "product_notes": {"type": "textarea", "label": "Product Notes"}
-    },
-    "page_3": {
-        "min_age": {"type": "number", "label": "Minimum Age"},
-        "max_age": {"type": "number", "label": "Maximum Age"},
-        "min_income": {"type": "number", "label": "Minimum Income ($)"},
-        "credit_score_requirement": {"type": "select", "label": "Credit Score Requirement", "options": ["Poor (300-579)", "Fair (580-669)", "Good (670-739)", "Very Good (740-799)", "Excellent (800-850)"]},
-        "employment_status": {"type": "multiselect", "label": "Employment Status", "options": ["Full-time", "Part-time", "Self-employed", "Retired", "Student"]},
-        "residence_requirement": {"type": "radio", "label": "Residence Requirement", "options": ["US Citizen", "US Resident", "International"]},
-        "debt_to_income_ratio": {"type": "slider", "label": "Max Debt-to-Income Ratio (%)", "min": 0, "max": 100},
-        "bankruptcy_allowed": {"type": "checkbox", "label": "Allow Previous Bankruptcy"},
-        "review_time": {"type": "time", "label": "Application Review Time"},
-        "eligibility_notes": {"type": "textarea", "label": "Eligibility Notes"}
-    }
-}
+    
+    if 'manual_fields' not in st.session_state:
+        # Fields the user changed by hand; AI follow-ups leave them alone by default
+        st.session_state.manual_fields = set()
+    
+    if 'last_ai_prompt' not in st.session_state:
+        st.session_state.last_ai_prompt = None
+    
+    if 'recent_timings' not in st.session_state:
+        st.session_state.recent_timings = new_recent(int(get_setting("DEBUG_TIMINGS_LIMIT", 50)))
 
 # Get OpenAI API key
 def get_openai_key():
@@ -74,192 +61,288 @@ def get_openai_key():
     except:
         return os.getenv("OPENAI_API_KEY")
 
-def call_openai_api(prompt: str) -> Dict[str, Any]:
-    """Call OpenAI API to extract field values from natural language prompt"""
-    
-    # Create field mapping for AI understanding
-    all_fields = {}
-    for page_fields in FIELD_SCHEMAS.values():
-        all_fields.update(page_fields)
-    
-    field_descriptions = {}
-    for field_name, field_info in all_fields.items():
-        field_descriptions[field_name] = {
-            "type": field_info["type"],
-            "label": field_info["label"]
-        }
-        if "options" in field_info:
-            field_descriptions[field_name]["options"] = field_info["options"]
-    
-    system_prompt = f"""You are an AI assistant that extracts credit card program information from natural language descriptions.
-
-Available fields and their types:
-{json.dumps(field_descriptions, indent=2)}
-
-Based on the user's prompt, extract relevant information and return it as a JSON object.
-- Only include fields that can be reasonably inferred from the prompt
-- For date fields, use YYYY-MM-DD format
-- For time fields, use HH:MM:SS format
-- For select/radio fields, use exact option values from the available options
-- For multiselect fields, return arrays of option values
-- For boolean fields (checkbox), use true/false
-- If a field is mentioned but not supported, include it in a special "unsupported_fields" array
-
-Return the response in this format:
-{{
-  "supported_fields": {{
-    "field_name": "value",
-    ...
-  }},
-  "unsupported_fields": ["field1", "field2", ...]
-}}
-
-Only return valid JSON without any additional text."""
-
+def get_setting(name: str, default: Any = None) -> Any:
+    """Read an optional setting from Streamlit secrets, then the environment"""
     try:
-        api_key = get_openai_key()
-        if not api_key:
-            st.error("OpenAI API key not found. Please configure it in secrets.toml")
-            return {"supported_fields": {}, "unsupported_fields": []}
-        
-        client = openai.OpenAI(api_key=api_key)
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=1000
-        )
-        
-        # Parse the JSON response
-        result = json.loads(response.choices[0].message.content)
-        return result
-        
-    except Exception as e:
-        st.error(f"Error calling OpenAI API: {str(e)}")
-        return {"supported_fields": {}, "unsupported_fields": []}
+        return st.secrets[name]
+    except Exception:
+        return os.getenv(name, default)
+
+@st.cache_resource
+def get_response_cache(schema_hash: str) -> ResponseCache:
+    """Response cache shared by every session; a new schema hash gets a fresh cache"""
+    return ResponseCache(
+        path=get_setting("AI_CACHE_PATH", ".cache/ai_responses.sqlite3") or None,
+        schema_hash=schema_hash,
+        max_memory_entries=int(get_setting("AI_CACHE_MEMORY_ENTRIES", 256)),
+        max_disk_entries=int(get_setting("AI_CACHE_MAX_ENTRIES", 5000)),
+        ttl_seconds=float(get_setting("AI_CACHE_TTL_HOURS", 168)) * 3600,
+    )
+
+@st.cache_resource
+def get_prompt_index(schema_hash: str) -> Optional["PromptIndex"]:
+    """Similarity index over processed prompts, shared by every session (None when disabled)"""
+    if str(get_setting("AI_SIMILAR_ENABLED", "true")).lower() not in ("1", "true", "yes"):
+        return None
+    from prompt_index import PromptIndex
+    return PromptIndex(
+        schema_hash,
+        max_entries=int(get_setting("AI_SIMILAR_MAX_ENTRIES", 1000)),
+        min_similarity=float(get_setting("AI_SIMILAR_MIN_SCORE", 0.8)),
+    )
+
+@st.cache_resource
+def get_submission_store() -> SubmissionStore:
+    """Submitted programs, shared by every session (in memory only when SUBMISSIONS_PATH is empty)"""
+    return SubmissionStore(get_setting("SUBMISSIONS_PATH", ".data/submissions.sqlite3") or None)
+
+@st.cache_resource
+def get_schema_source(path: str) -> SchemaSource:
+    """The form schema file, shared by every session and reloaded when it changes"""
+    return SchemaSource(path, check_interval_s=float(get_setting("FORM_SCHEMA_CHECK_SECONDS", 1)))
+
+def get_form_schema() -> FormSchema:
+    """Current compiled schema: pages, field index, coercers and option indexes"""
+    return get_schema_source(get_setting("FORM_SCHEMA_PATH") or SCHEMA_PATH).current()
+
+@st.cache_resource(max_entries=4)
+def get_rule_extractor(schema_hash: str, _field_schemas: Dict[str, Dict]) -> "RuleExtractor":
+    """Rules alone, for working out follow-ups without an API key; one per schema version"""
+    from rule_extractor import RuleExtractor
+    return RuleExtractor(_field_schemas)
 
-def render_field(field_name: str, field_info: Dict, current_value: Any = None):
-    """Render a form field based on its type"""
+@st.cache_resource(max_entries=4)
+def get_extractor(api_key: str, schema_hash: str, _field_schemas: Dict[str, Dict]) -> "FieldExtractor":
+    """Extractor with a precompiled prompt and pooled client, built once per process and schema version"""
+    from extractor import FieldExtractor
+    return FieldExtractor(
+        _field_schemas,
+        api_key=api_key,
+        model=get_setting("OPENAI_MODEL", "gpt-4"),
+        timeout=float(get_setting("OPENAI_TIMEOUT_SECONDS", 60)),
+        connect_timeout=float(get_setting("OPENAI_CONNECT_TIMEOUT_SECONDS", 5)),
+        # Jobs retry with backoff against their deadline, so the client does not by default
+        max_retries=int(get_setting("OPENAI_MAX_RETRIES", 0)),
+        cache=get_response_cache(schema_hash),
+        output_mode=get_setting("OPENAI_OUTPUT_MODE", "tools"),
+        index=get_prompt_index(schema_hash),
+        # Optional cheaper first tier; replies below AI_MIN_CONFIDENCE go to OPENAI_MODEL
+        fast_model=get_setting("OPENAI_FAST_MODEL") or None,
+        min_confidence=float(get_setting("AI_MIN_CONFIDENCE", 0.7)),
+    )
+
+@st.cache_resource
+def start_metrics_export() -> bool:
+    """Start the optional metrics exporters once per process"""
+    port = get_setting("METRICS_PORT")
+    if port:
+        start_http_exporter(REGISTRY, int(port))
+    path = get_setting("METRICS_FILE")
+    if path:
+        start_file_exporter(REGISTRY, path, float(get_setting("METRICS_FLUSH_SECONDS", 60)))
+    return True
+
+def debug_timings_enabled() -> bool:
+    """Timing sidebar, opt-in with DEBUG_TIMINGS or the ?debug=timings query parameter"""
+    if st.query_params.get("debug") == "timings":
+        return True
+    return str(get_setting("DEBUG_TIMINGS", "")).lower() in ("1", "true", "yes")
+
+@st.cache_resource
+def get_job_runner() -> "JobRunner":
+    """Thread pool running AI extraction jobs for every session"""
+    from ai_jobs import JobRunner
+    return JobRunner(max_workers=int(get_setting("AI_JOB_WORKERS", 8)))
+
+def submit_ai_job(
+    prompt: str, stream: bool = True, current_values: Optional[Dict[str, Any]] = None
+) -> Optional["ExtractionJob"]:
+    """Start extracting field values from a natural language prompt in the background
+    
+    Fields the rule-based pre-extractor can resolve are filled locally; only
+    the rest goes to the model. The page polls the returned job instead of
+    waiting for the call, see ``render_ai_job_status``. With ``current_values``
+    the prompt is a follow-up and the job only returns the fields it changes.
+    """
+    
+    api_key = get_openai_key()
+    if not api_key:
+        st.error("OpenAI API key not found. Please configure it in secrets.toml")
+        return None
+    
+    schema = get_form_schema()
+    return get_job_runner().submit(
+        get_extractor(api_key, schema.hash, schema.field_schemas),
+        prompt,
+        stream=stream,
+        deadline_s=float(get_setting("AI_JOB_DEADLINE_SECONDS", 90)),
+        max_attempts=int(get_setting("AI_JOB_MAX_ATTEMPTS", 3)),
+        hedge_after_s=float(get_setting("AI_JOB_HEDGE_AFTER_SECONDS", 0)),
+        current_values=current_values,
+    )
+
+def widget_key(field_name: str) -> str:
+    """Session state key of the widget bound to a field"""
+    return f"field_{field_name}"
+
+def default_widget_value(field: CompiledField, current_value: Any = None) -> Any:
+    """Initial widget value for a field, falling back to the type's default"""
+    field_type = field.type
     
-    field_type = field_info["type"]
-    label = field_info["label"]
+    if field_type in ("text", "textarea"):
+        return current_value or ""
+    elif field_type == "number":
+        return current_value or 0
+    elif field_type == "date":
+        return current_value or date.today()
+    elif field_type == "time":
+        return current_value or time(9, 0)
+    elif field_type in ("select", "radio"):
+        return current_value if current_value in field.option_index else field.options[0]
+    elif field_type == "multiselect":
+        return current_value or []
+    elif field_type == "checkbox":
+        return current_value or False
+    elif field_type == "slider":
+        return field.min if current_value is None else current_value
+    else:
+        return current_value or ""
+
+def current_form_values() -> Dict[str, Any]:
+    """Filled-in form values in the JSON-friendly form the extractor uses"""
+    fields = get_form_schema().fields
+    values = {}
+    for field_name, value in st.session_state.form_data.items():
+        if value in (None, "", []) or field_name not in fields:
+            continue
+        if isinstance(value, (date, time)):
+            value = value.isoformat()
+        try:
+            values[field_name] = validate_value(fields[field_name], value)
+        except (TypeError, ValueError):
+            continue
+    return values
+
+def store_form_value(field_name: str, value: Any):
+    """Keep a widget's value in form_data, noting fields the user changed by hand
+    
+    AI values are written to form_data before their widgets are seeded, so
+    only a user edit makes a widget disagree with the stored value.
+    """
+    previous = st.session_state.form_data.get(field_name)
+    if previous is not None and value != previous:
+        st.session_state.manual_fields.add(field_name)
+    st.session_state.form_data[field_name] = value
+
+def sync_form_schema(schema: FormSchema):
+    """Adapt this session to a reloaded schema
+    
+    Stored values of fields whose definition changed are converted to the
+    new type (or dropped when they no longer fit) and their widgets are
+    reset, so a changed type or option list never meets stale widget state.
+    """
+    previous_version = st.session_state.get("form_schema_version")
+    if previous_version == schema.version:
+        return
+    st.session_state.form_schema_version = schema.version
+    if previous_version is None:
+        return
+    
+    previous = get_schema_source(get_setting("FORM_SCHEMA_PATH") or SCHEMA_PATH).version(previous_version)
+    # Too old to compare: treat every field as changed
+    changed = schema.changed_fields(previous) if previous is not None else list(schema.fields)
+    form_data = st.session_state.form_data
+    for field_name in changed:
+        st.session_state.pop(widget_key(field_name), None)
+        if field_name in form_data:
+            value = schema.compiled[field_name].coerce(form_data[field_name])
+            if value in (None, []):
+                form_data.pop(field_name)
+            else:
+                form_data[field_name] = value
+    # The review page comes after the last form page
+    st.session_state.current_page = min(st.session_state.current_page, len(schema.pages))
+
+def set_form_values(values: Dict[str, Any]):
+    """Write typed values into form_data and drop the stale widget state for those fields"""
+    st.session_state.form_data.update(values)
+    for field_name in values:
+        st.session_state.pop(widget_key(field_name), None)
+
+@REGISTRY.timed("render_field", recent=False)
+def render_field(field: CompiledField, current_value: Any = None):
+    """Render a form field based on its type
+    
+    The widget is keyed by field name and seeded from ``current_value`` (already
+    typed, see ``CompiledField.coerce``) the first time it is shown; after that
+    its value lives in session state.
+    """
+    
+    field_type = field.type
+    label = field.label
+    key = widget_key(field.name)
+    if key not in st.session_state:
+        st.session_state[key] = default_widget_value(field, current_value)
     
     if field_type == "text":
-        return st.text_input(label, value=current_value or "")
+        return st.text_input(label, key=key)
     
     elif field_type == "number":
-        return st.number_input(label, value=current_value or 0)
+        return st.number_input(label, key=key)
     
     elif field_type == "date":
-        if current_value and isinstance(current_value, str):
-            try:
-                current_value = datetime.strptime(current_value, "%Y-%m-%d").date()
-            except:
-                current_value = date.today()
-        return st.date_input(label, value=current_value or date.today())
+        return st.date_input(label, key=key)
     
     elif field_type == "time":
-        if current_value and isinstance(current_value, str):
-            try:
-                current_value = datetime.strptime(current_value, "%H:%M:%S").time()
-            except:
-                current_value = time(9, 0)
-        return st.time_input(label, value=current_value or time(9, 0))
+        return st.time_input(label, key=key)
     
     elif field_type == "select":
-        options = field_info["options"]
-        index = 0
-        if current_value and current_value in options:
-            index = options.index(current_value)
-        return st.selectbox(label, options, index=index)
+        return st.selectbox(label, field.options, key=key)
     
     elif field_type == "multiselect":
-        options = field_info["options"]
-        default = current_value if current_value else []
-        return st.multiselect(label, options, default=default)
+        return st.multiselect(label, field.options, key=key)
     
     elif field_type == "checkbox":
-        return st.checkbox(label, value=current_value or False)
+        return st.checkbox(label, key=key)
     
     elif field_type == "radio":
-        options = field_info["options"]
-        index = 0
-        if current_value and current_value in options:
-            index = options.index(current_value)
-        return st.radio(label, options, index=index)
+        return st.radio(label, field.options, key=key)
     
     elif field_type == "textarea":
-        return st.text_area(label, value=current_value or "", height=100)
+        return st.text_area(label, height=100, key=key)
     
     elif field_type == "slider":
-        min_val = field_info.get("min", 0)
-        max_val = field_info.get("max", 100)
-        step = field_info.get("step", 1)
-        
-        # Handle current_value type conversion
-        if current_value is None:
-            safe_value = min_val
-        elif isinstance(current_value, list):
-            # Convert list to tuple for range slider or take first element for regular slider
-            if len(current_value) > 1:
-                # Range slider - convert to tuple
-                safe_value = tuple(current_value[:2])
-            elif len(current_value) > 0 and isinstance(current_value[0], (int, float)):
-                # Single value - take first element
-                safe_value = current_value[0]
-            else:
-                safe_value = min_val
-        elif isinstance(current_value, (int, float)):
-            safe_value = current_value
-        else:
-            # Try to convert string to number
-            try:
-                safe_value = float(current_value)
-            except (ValueError, TypeError):
-                safe_value = min_val
-        
-        # Determine if we should use int or float based on whether any value contains decimal
-        use_float = (isinstance(min_val, float) or isinstance(max_val, float) or 
-                    isinstance(step, float) or isinstance(safe_value, float) or
-                    (isinstance(safe_value, tuple) and any(isinstance(x, float) for x in safe_value)))
-        
-        # Cast all values to the same type
-        if use_float:
-            min_val = float(min_val)
-            max_val = float(max_val)
-            step = float(step)
-            if isinstance(safe_value, tuple):
-                safe_value = tuple(float(x) for x in safe_value)
-            else:
-                safe_value = float(safe_value)
-        else:
-            min_val = int(min_val)
-            max_val = int(max_val)
-            step = int(step)
-            if isinstance(safe_value, tuple):
-                safe_value = tuple(int(x) for x in safe_value)
-            else:
-                safe_value = int(safe_value)
-        
-        # Ensure safe_value is within bounds
-        if isinstance(safe_value, tuple):
-            safe_value = tuple(max(min_val, min(max_val, x)) for x in safe_value)
-        else:
-            safe_value = max(min_val, min(max_val, safe_value))
-        
-        return st.slider(label, min_value=min_val, max_value=max_val, value=safe_value, step=step)
+        return st.slider(label, min_value=field.min, max_value=field.max, step=field.step, key=key)
     
     else:
-        return st.text_input(label, value=current_value or "")
+        return st.text_input(label, key=key)
 
-def page_1_basic_details():
-    """Page 1: Basic Program Details"""
-    st.header("📋 Basic Program Details")
-    
-    # AI Prompt Section
+@st.fragment
+@REGISTRY.timed("fragment", fragment="page_fields")
+def render_page_fields(page_key: str):
+    """Render a page's fields in the columns laid out by the schema
+    
+    Runs as a fragment: changing one of these widgets reruns only this
+    function, not the title, progress indicator or the rest of the page.
+    Only this page's fields are rendered, however large the schema is.
+    """
+    schema = get_form_schema()
+    if page_key not in schema.page_index:
+        # The page was removed by a schema reload
+        st.rerun(scope="app")
+    compiled_fields = schema.compiled
+    page = schema.page(page_key)
+    
+    for column, field_names in zip(st.columns(len(page.columns)), page.columns):
+        with column:
+            for field_name in field_names:
+                current_value = st.session_state.form_data.get(field_name)
+                store_form_value(field_name, render_field(compiled_fields[field_name], current_value))
+
+@st.fragment
+@REGISTRY.timed("fragment", fragment="ai_section")
+def render_ai_section():
+    """AI prompt, options and trigger; typing here does not rerun the form below"""
     st.subheader("🤖 AI-Powered Setup")
     st.write("Use AI to auto-fill form fields")
     
@@ -269,101 +352,312 @@ def page_1_basic_details():
         height=100
     )
     
-    col1, col2 = st.columns([1, 3])
-    with col1:
-        if st.button("🚀 Process with AI", type="primary"):
-            if ai_prompt:
-                with st.spinner("Processing with AI..."):
-                    result = call_openai_api(ai_prompt)
-                    
-                    # Store supported fields in session state
-                    if result.get("supported_fields"):
-                        for field_name, value in result["supported_fields"].items():
-                            st.session_state.form_data[field_name] = value
-                        st.success(f"✅ Auto-filled {len(result['supported_fields'])} fields!")
-                    
-                    # Store unsupported fields
-                    if result.get("unsupported_fields"):
-                        st.session_state.unsupported_fields = result["unsupported_fields"]
-                        st.warning(f"⚠️ {len(result['unsupported_fields'])} fields were mentioned but not supported")
-                    
-                    st.session_state.ai_processed = True
-                    st.rerun()
-            else:
-                st.error("Please enter a prompt first")
+    stream_results = st.toggle(
+        "⚡ Stream results as they arrive",
+        value=True,
+        help="Fill fields while the model is still generating instead of waiting for the full reply"
+    )
     
-    # Form Fields
-    st.subheader("Program Information")
+    followup = False
+    if st.session_state.last_ai_prompt:
+        followup = st.toggle(
+            "🔁 Follow-up: send only what changed",
+            value=True,
+            help="Treat the prompt as a change to the filled-in form: only the new or removed "
+                 "clauses and the fields they touch go to the model"
+        )
     
-    # Create two columns for better layout
-    col1, col2 = st.columns(2)
+    overwrite_manual = False
+    if st.session_state.manual_fields:
+        overwrite_manual = st.checkbox(
+            "Overwrite fields I edited by hand",
+            value=False,
+            help=f"{len(st.session_state.manual_fields)} field(s) edited by hand are kept unless this is on"
+        )
     
-    page_1_fields = FIELD_SCHEMAS["page_1"]
-    field_names = list(page_1_fields.keys())
+    job = st.session_state.get("ai_job")
     
-    # First column - fields 1-5
+    col1, col2 = st.columns([1, 3])
     with col1:
-        for field_name in field_names[:5]:
-            field_info = page_1_fields[field_name]
-            current_value = st.session_state.form_data.get(field_name)
-            st.session_state.form_data[field_name] = render_field(field_name, field_info, current_value)
+        if st.button("🚀 Process with AI", type="primary", disabled=job is not None):
+            if not ai_prompt:
+                st.error("Please enter a prompt first")
+            else:
+                prompt, current_values = ai_prompt, None
+                if followup:
+                    from extractor import followup_instruction
+                    schema = get_form_schema()
+                    rules = get_rule_extractor(schema.hash, schema.field_schemas)
+                    prompt = followup_instruction(st.session_state.last_ai_prompt, ai_prompt, rules)
+                    current_values = current_form_values()
+                if not prompt:
+                    st.info("Nothing changed since the last run")
+                else:
+                    job = submit_ai_job(prompt, stream=stream_results, current_values=current_values)
+                    if job is not None:
+                        st.session_state.ai_job = job
+                        st.session_state.ai_applied_fields = {}
+                        st.session_state.ai_kept_fields = set()
+                        st.session_state.ai_followup = followup
+                        st.session_state.ai_overwrite_manual = overwrite_manual
+                        st.session_state.ai_outcome = None
+                        # Becomes last_ai_prompt once the job succeeds, so a failed run can be retried as is
+                        st.session_state.ai_job_prompt = ai_prompt
+                        # Full rerun so the job status poller starts
+                        st.rerun(scope="app")
     
-    # Second column - fields 6-10
     with col2:
-        for field_name in field_names[5:]:
-            field_info = page_1_fields[field_name]
-            current_value = st.session_state.form_data.get(field_name)
-            st.session_state.form_data[field_name] = render_field(field_name, field_info, current_value)
+        stats = get_response_cache(get_form_schema().hash).stats()
+        caption = f"Response cache: {stats['hits']} hits · {stats['misses']} misses"
+        timing = st.session_state.get("ai_timing")
+        if timing:
+            caption += f" · Last run: {timing['total_s']:.1f}s total"
+            if timing["first_field_s"] is not None:
+                caption += f", first field after {timing['first_field_s']:.1f}s"
+            if timing["attempts"] > 1:
+                caption += f", {timing['attempts']} attempts"
+            if timing["hedged"]:
+                caption += ", hedged"
+        st.caption(caption)
+    
+    outcome = st.session_state.get("ai_outcome")
+    if outcome:
+        for kind, message in outcome:
+            getattr(st, kind)(message)
 
-def page_2_product_configuration():
-    """Page 2: Product Configuration"""
-    st.header("🎯 Product Configuration")
-    
-    # Create two columns for better layout
-    col1, col2 = st.columns(2)
-    
-    page_2_fields = FIELD_SCHEMAS["page_2"]
-    field_names = list(page_2_fields.keys())
-    
-    # First column - fields 1-5
+def export_submissions(store: SubmissionStore, file_format: str, filters: Dict[str, Any], field_names: List[str]) -> bytes:
+    """Download contents for the saved programs matching ``filters``
+    
+    Rows are spooled to a temporary file rather than built up as one string,
+    but Streamlit keeps the finished download in memory; very large exports
+    belong on the ``submission_store.py`` command line.
+    """
+    with tempfile.TemporaryFile() as spool:
+        handle = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+        if file_format == "csv":
+            store.export_csv(handle, field_names, **filters)
+        else:
+            store.export_jsonl(handle, **filters)
+        handle.flush()
+        spool.seek(0)
+        data = spool.read()
+        handle.detach()
+        return data
+
+def prefill_from_submission(submission_id: int):
+    """Replace the form with a saved program's values"""
+    submission = get_submission_store().get(submission_id)
+    if submission is None:
+        st.error(f"Saved program #{submission_id} no longer exists")
+        return
+    
+    schema = get_form_schema()
+    for field_name in schema.fields:
+        st.session_state.pop(widget_key(field_name), None)
+    st.session_state.form_data = {}
+    set_form_values(coerce_fields(schema.compiled, submission["form_data"]))
+    st.session_state.unsupported_fields = submission["unsupported_fields"]
+    st.session_state.manual_fields = set()
+    st.session_state.last_ai_prompt = None
+    st.session_state.ai_processed = False
+    st.session_state.ai_outcome = [("success", f"📂 Loaded saved program #{submission_id}")]
+    st.rerun(scope="app")
+
+@st.fragment
+@REGISTRY.timed("fragment", fragment="saved_programs")
+def render_saved_programs():
+    """Search saved programs, start the form from one of them, export them
+    
+    Nothing is queried until the toggle is on. Results are paged by id, so
+    every page costs one indexed query however many programs are saved.
+    """
+    if not st.toggle("📂 Start from a saved program", key="show_saved_programs"):
+        return
+    
+    store = get_submission_store()
+    schema = get_form_schema()
+    col1, col2 = st.columns([3, 1])
     with col1:
-        for field_name in field_names[:5]:
-            field_info = page_2_fields[field_name]
-            current_value = st.session_state.form_data.get(field_name)
-            st.session_state.form_data[field_name] = render_field(field_name, field_info, current_value)
+        text = st.text_input("Search by program code or name", key="saved_search")
+    with col2:
+        status_options = schema.fields.get("program_status", {}).get("options", [])
+        status = st.selectbox("Status", ["Any"] + list(status_options), key="saved_status")
+    filters = {"text": text.strip() or None, "status": None if status == "Any" else status}
+    
+    # First id of every page seen so far (None = newest), reset when the filters change
+    if st.session_state.get("saved_filters") != filters:
+        st.session_state.saved_filters = filters
+        st.session_state.saved_page_starts = [None]
+    page_starts = st.session_state.saved_page_starts
+    page_size = int(get_setting("SUBMISSIONS_PAGE_SIZE", 10))
+    rows = store.search(**filters, before_id=page_starts[-1], limit=page_size)
+    
+    if not rows:
+        st.caption("No saved programs match")
+    for row in rows:
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            st.write(
+                f"**{row.program_name or 'Untitled'}** · `{row.program_code or '—'}` · "
+                f"{row.program_status or '—'} · launch {row.launch_date or '—'} · #{row.id}"
+            )
+        with col2:
+            if st.button("Load", key=f"load_submission_{row.id}", use_container_width=True):
+                prefill_from_submission(row.id)
     
-    # Second column - fields 6-10
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("⬅️ Newer", disabled=len(page_starts) == 1, key="saved_newer", on_click=page_starts.pop)
     with col2:
-        for field_name in field_names[5:]:
-            field_info = page_2_fields[field_name]
-            current_value = st.session_state.form_data.get(field_name)
-            st.session_state.form_data[field_name] = render_field(field_name, field_info, current_value)
-
-def page_3_eligibility_rules():
-    """Page 3: Eligibility and Rules"""
-    st.header("✅ Eligibility and Rules")
+        first = (len(page_starts) - 1) * page_size
+        st.caption(f"{first + 1 if rows else 0}–{first + len(rows)} of {store.count(**filters)} saved programs")
+    with col3:
+        st.button(
+            "Older ➡️", disabled=len(rows) < page_size, key="saved_older",
+            on_click=page_starts.append, args=(rows[-1].id if rows else None,)
+        )
     
-    # Create two columns for better layout
+    field_names = list(schema.fields)
+    st.caption("For large exports use `python submission_store.py --format csv -o programs.csv`")
     col1, col2 = st.columns(2)
-    
-    page_3_fields = FIELD_SCHEMAS["page_3"]
-    field_names = list(page_3_fields.keys())
-    
-    # First column - fields 1-5
+    for column, file_format, mime in ((col1, "csv", "text/csv"), (col2, "jsonl", "application/jsonl")):
+        with column:
+            st.download_button(
+                f"⬇️ Export {file_format.upper()}",
+                # Only built when clicked, on a separate thread
+                functools.partial(export_submissions, store, file_format, dict(filters), field_names),
+                file_name=f"programs.{file_format}",
+                mime=mime,
+                use_container_width=True,
+            )
+
+def apply_ai_fields(fields: Dict[str, Any]) -> bool:
+    """Fill the form with AI values not applied yet; True if anything changed
+    
+    Fields the user edited by hand are kept unless the job was started with
+    "Overwrite fields I edited by hand".
+    """
+    applied = st.session_state.ai_applied_fields
+    new_fields = {name: value for name, value in fields.items() if name not in applied or applied[name] != value}
+    if not st.session_state.get("ai_overwrite_manual"):
+        kept = new_fields.keys() & st.session_state.manual_fields
+        st.session_state.ai_kept_fields.update(kept)
+        new_fields = {name: value for name, value in new_fields.items() if name not in kept}
+    if not new_fields:
+        return False
+    
+    # Convert to typed widget values once, so reruns only read them
+    set_form_values(coerce_fields(get_form_schema().compiled, new_fields))
+    applied.update(new_fields)
+    return True
+
+def finish_ai_job(job: "ExtractionJob"):
+    """Apply a finished job's result and record its outcome for display"""
+    from ai_jobs import CANCELLED, SUCCEEDED
+    
+    state = job.snapshot()
+    result = state["result"] or {}
+    apply_ai_fields(result.get("supported_fields", {}))
+    
+    applied = st.session_state.ai_applied_fields
+    # Fields the AI just filled are no longer hand edits
+    st.session_state.manual_fields -= applied.keys()
+    
+    if state["status"] == SUCCEEDED:
+        st.session_state.last_ai_prompt = st.session_state.ai_job_prompt
+    
+    outcome = []
+    if state["status"] == SUCCEEDED and st.session_state.ai_followup:
+        outcome.append(("success", f"✅ Updated {len(applied)} fields!"))
+    elif state["status"] == SUCCEEDED:
+        outcome.append(("success", f"✅ Auto-filled {len(applied)} fields!"))
+    elif state["status"] == CANCELLED:
+        outcome.append(("info", "AI processing cancelled; fields received so far were kept"))
+    else:
+        outcome.append(("error", f"Error calling OpenAI API: {state['error']}"))
+    
+    schema = get_form_schema()
+    filled_pages = sorted({schema.page_index[schema.field_page[name]] for name in applied if name in schema.field_page})
+    if len(filled_pages) > 1:
+        outcome.append(("caption", "Filled on: " + ", ".join(schema.pages[index].nav_title for index in filled_pages)))
+    
+    kept = st.session_state.ai_kept_fields
+    if kept:
+        compiled_fields = schema.compiled
+        labels = ", ".join(sorted(compiled_fields[name].label for name in kept if name in compiled_fields))
+        outcome.append(("info", f"✋ Kept your edits for: {labels}"))
+    
+    # Store unsupported fields; a follow-up adds to the earlier ones
+    if result.get("unsupported_fields"):
+        unsupported = result["unsupported_fields"]
+        if st.session_state.ai_followup:
+            earlier = st.session_state.unsupported_fields
+            unsupported = earlier + [name for name in unsupported if name not in earlier]
+        st.session_state.unsupported_fields = unsupported
+        outcome.append(("warning", f"⚠️ {len(result['unsupported_fields'])} fields were mentioned but not supported"))
+    
+    st.session_state.ai_outcome = outcome
+    st.session_state.ai_timing = {
+        "first_field_s": state["first_field_s"],
+        "total_s": state["elapsed_s"],
+        "attempts": state["attempts"],
+        "hedged": state["hedged"],
+    }
+    st.session_state.ai_processed = state["status"] == SUCCEEDED
+    st.session_state.ai_job = None
+
+@st.fragment(run_every=0.5)
+@REGISTRY.timed("fragment", fragment="ai_job_poll", recent=False)
+def poll_ai_job():
+    """Poll the running AI job, filling fields as they stream in"""
+    job = st.session_state.get("ai_job")
+    if job is None:
+        return
+    
+    if job.done:
+        finish_ai_job(job)
+        # Full rerun so the form and the AI section pick up the result
+        st.rerun(scope="app")
+    
+    state = job.snapshot()
+    if apply_ai_fields(state["partial_fields"]):
+        st.rerun(scope="app")
+    
+    col1, col2 = st.columns([3, 1])
     with col1:
-        for field_name in field_names[:5]:
-            field_info = page_3_fields[field_name]
-            current_value = st.session_state.form_data.get(field_name)
-            st.session_state.form_data[field_name] = render_field(field_name, field_info, current_value)
-    
-    # Second column - fields 6-10
+        label = f"Processing with AI... {state['elapsed_s']:.0f}s"
+        if state["attempts"] > 1:
+            label += f" (attempt {state['attempts']})"
+        with st.status(label, expanded=bool(state["partial_fields"])):
+            compiled_fields = get_form_schema().compiled
+            for field_name, value in state["partial_fields"].items():
+                if field_name in compiled_fields:
+                    st.write(f"✍️ **{compiled_fields[field_name].label}:** {value}")
     with col2:
-        for field_name in field_names[5:]:
-            field_info = page_3_fields[field_name]
-            current_value = st.session_state.form_data.get(field_name)
-            st.session_state.form_data[field_name] = render_field(field_name, field_info, current_value)
+        if st.button("✖️ Cancel", disabled=job.cancel_requested, use_container_width=True):
+            job.cancel()
+
+def render_ai_job_status():
+    """Show the running AI job; polling only happens while there is one"""
+    if st.session_state.get("ai_job") is not None:
+        poll_ai_job()
 
-def review_page():
+def render_page(page: PageSpec):
+    """Render one form page; pages differ only in what the schema says about them"""
+    with REGISTRY.span("page", page=page.key):
+        st.header(f"{page.icon} {page.title}".strip())
+        
+        if page.ai_section:
+            render_saved_programs()
+            render_ai_section()
+        
+        if page.subheader:
+            st.subheader(page.subheader)
+        
+        render_page_fields(page.key)
+
+@REGISTRY.timed("page", page="review")
+def review_page(schema: FormSchema):
     """Review Page: Show all entered data"""
     st.header("📊 Review & Submit")
     
@@ -375,42 +669,22 @@ def review_page():
         )
     
     # Group data by pages
-    pages = [
-        ("📋 Basic Program Details", "page_1"),
-        ("🎯 Product Configuration", "page_2"),
-        ("✅ Eligibility and Rules", "page_3")
-    ]
-    
-    for page_title, page_key in pages:
-        st.subheader(page_title)
+    for page in schema.pages:
+        st.subheader(f"{page.icon} {page.title}".strip())
         
-        page_fields = FIELD_SCHEMAS[page_key]
         has_data = False
         
         # Create a container for this page's data
         with st.container():
-            col1, col2 = st.columns(2)
-            field_names = list(page_fields.keys())
-            
-            with col1:
-                for field_name in field_names[:5]:
-                    field_info = page_fields[field_name]
-                    value = st.session_state.form_data.get(field_name)
-                    if value:
-                        has_data = True
-                        if isinstance(value, list):
-                            value = ", ".join(value)
-                        st.write(f"**{field_info['label']}:** {value}")
-            
-            with col2:
-                for field_name in field_names[5:]:
-                    field_info = page_fields[field_name]
-                    value = st.session_state.form_data.get(field_name)
-                    if value:
-                        has_data = True
-                        if isinstance(value, list):
-                            value = ", ".join(value)
-                        st.write(f"**{field_info['label']}:** {value}")
+            for column, field_names in zip(st.columns(len(page.columns)), page.columns):
+                with column:
+                    for field_name in field_names:
+                        value = st.session_state.form_data.get(field_name)
+                        if value:
+                            has_data = True
+                            if isinstance(value, list):
+                                value = ", ".join(value)
+                            st.write(f"**{schema.fields[field_name]['label']}:** {value}")
         
         if not has_data:
             st.write("*No data entered for this section*")
@@ -419,12 +693,17 @@ def review_page():
     
     # Submit button
     if st.button("🚀 Submit Program", type="primary", use_container_width=True):
-        st.success("✅ Credit Card Program submitted successfully!")
+        submission_id = get_submission_store().save(
+            {name: value for name, value in st.session_state.form_data.items() if name in schema.fields},
+            st.session_state.unsupported_fields,
+            schema.hash,
+        )
+        st.success(f"✅ Credit Card Program submitted successfully! Saved as #{submission_id}")
         
         # Show final summary
         st.subheader("📋 Submission Summary")
-        total_fields = sum(len(fields) for fields in FIELD_SCHEMAS.values())
-        filled_fields = sum(1 for value in st.session_state.form_data.values() if value)
+        total_fields = len(schema.fields)
+        filled_fields = sum(1 for name, value in st.session_state.form_data.items() if value and name in schema.fields)
         
         st.write(f"**Total Fields:** {total_fields}")
         st.write(f"**Filled Fields:** {filled_fields}")
@@ -433,9 +712,13 @@ def review_page():
         if st.session_state.unsupported_fields:
             st.write(f"**Unsupported Fields:** {len(st.session_state.unsupported_fields)}")
 
-def render_progress_indicator():
+def page_titles(schema: FormSchema) -> List[str]:
+    """Navigation titles of every step: the schema's pages, then the review"""
+    return [page.nav_title for page in schema.pages] + ["Review"]
+
+def render_progress_indicator(schema: FormSchema):
     """Render progress indicator at the top"""
-    pages = ["Basic Details", "Product Config", "Eligibility", "Review"]
+    pages = page_titles(schema)
     current_page = st.session_state.current_page
     
     # Progress indicator
@@ -445,9 +728,9 @@ def render_progress_indicator():
     # Page indicator
     st.write(f"Step {current_page + 1} of {len(pages)}: {pages[current_page]}")
 
-def render_navigation_buttons():
+def render_navigation_buttons(schema: FormSchema):
     """Render navigation buttons at the bottom"""
-    pages = ["Basic Details", "Product Config", "Eligibility", "Review"]
+    pages = page_titles(schema)
     current_page = st.session_state.current_page
     
     # Add spacing before navigation buttons
@@ -468,32 +751,67 @@ def render_navigation_buttons():
                 st.session_state.current_page += 1
                 st.rerun()
 
+def render_timings_sidebar():
+    """Debug sidebar: this session's most recent spans and process-wide histograms"""
+    with st.sidebar:
+        st.subheader("⏱️ Timings")
+        recent = [
+            {**entry, "at": datetime.fromtimestamp(entry["at"]).strftime("%H:%M:%S.%f")[:-3]}
+            for entry in reversed(st.session_state.recent_timings)
+        ]
+        if recent:
+            st.dataframe(recent, hide_index=True, use_container_width=True)
+        else:
+            st.caption("No timings recorded yet")
+        
+        with st.expander("All sessions"):
+            st.dataframe(REGISTRY.summary(), hide_index=True, use_container_width=True)
+            tiers = tier_report(REGISTRY)
+            if tiers:
+                st.caption("Model tiers")
+                st.dataframe(
+                    [{"model": model, **row} for model, row in tiers.items()],
+                    hide_index=True, use_container_width=True
+                )
+        
+        if st.button("Clear timings"):
+            st.session_state.recent_timings.clear()
+
+@REGISTRY.timed("script_run")
 def main():
     """Main application logic"""
     init_session_state()
+    start_metrics_export()
+    schema = get_form_schema()
+    sync_form_schema(schema)
+    show_timings = debug_timings_enabled()
+    # Spans from this run (and AI jobs it starts) go to the session's recent timings
+    bind_recent(st.session_state.recent_timings if show_timings else None)
     
     st.title("💳 Credit Card Program Setup")
     st.markdown("*Internal tool for implementation team*")
     
     # Render progress indicator at the top
-    render_progress_indicator()
+    render_progress_indicator(schema)
+    
+    # AI job status stays visible (and keeps filling the form) on every page
+    render_ai_job_status()
     
     st.markdown("---")
     
     # Render current page
     current_page = st.session_state.current_page
     
-    if current_page == 0:
-        page_1_basic_details()
-    elif current_page == 1:
-        page_2_product_configuration()
-    elif current_page == 2:
-        page_3_eligibility_rules()
-    elif current_page == 3:
-        review_page()
+    if current_page < len(schema.pages):
+        render_page(schema.pages[current_page])
+    else:
+        review_page(schema)
     
     # Render navigation buttons at the bottom
-    render_navigation_buttons()
+    render_navigation_buttons(schema)
+    
+    if show_timings:
+        render_timings_sidebar()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
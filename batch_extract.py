@@ -0,0 +1,217 @@
+"""Headless batch extraction: prompts from JSONL/CSV in, validated form data as JSONL out.
+
+Example:
+    python batch_extract.py programs.csv --prompt-column description -o results.jsonl --concurrency 8
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import openai
+
+from extractor import TRANSIENT_ERRORS, ExtractionError, FieldExtractor, retry_delay
+from field_schemas import ALL_FIELDS, FIELD_SCHEMAS, SCHEMA_HASH
+from field_validation import validate_fields
+from metrics import REGISTRY
+from model_tiers import tier_report
+from prompt_index import PromptIndex
+from response_cache import ResponseCache
+
+
+def read_records(path: str, input_format: str, prompt_column: str, id_column: str) -> Iterator[Dict[str, Any]]:
+    """Yield ``{"id", "prompt"}`` records one at a time from a JSONL or CSV file"""
+    handle = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    try:
+        if input_format == "csv":
+            rows = csv.DictReader(handle)
+        else:
+            rows = (json.loads(line) for line in handle if line.strip())
+        for number, row in enumerate(rows, start=1):
+            yield {"id": row.get(id_column) or number, "prompt": row.get(prompt_column) or ""}
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+class RateLimitGate:
+    """Pause shared by concurrent extractions: after a 429 nobody sends until its delay is over.
+
+    Without it only the rate-limited request waits, and the other workers
+    keep hitting the limit in the meantime.
+    """
+
+    def __init__(self):
+        self.resume_at = 0.0
+
+    def pause(self, delay: float):
+        self.resume_at = max(self.resume_at, time.monotonic() + delay)
+
+    async def wait(self):
+        # Another 429 may push resume_at further while we sleep
+        while self.resume_at > time.monotonic():
+            await asyncio.sleep(self.resume_at - time.monotonic())
+
+
+async def extract_record(
+    extractor: FieldExtractor,
+    record: Dict[str, Any],
+    max_attempts: int = 6,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+    gate: Optional[RateLimitGate] = None,
+) -> Dict[str, Any]:
+    """Extract and validate one record, retrying transient API errors
+
+    With a ``gate``, a 429 pauses every extraction sharing it for the
+    Retry-After delay (or the backoff); other transient errors only delay
+    this record.
+    """
+    started = time.perf_counter()
+    output = {"id": record["id"], "form_data": {}, "unsupported_fields": [], "rejected_fields": [], "error": None}
+
+    attempt = 0
+    while True:
+        attempt += 1
+        if gate is not None:
+            await gate.wait()
+        try:
+            result = await extractor.aextract(record["prompt"])
+            break
+        except ExtractionError as e:
+            cause = e.__cause__
+            if isinstance(cause, TRANSIENT_ERRORS) and attempt < max_attempts:
+                delay = retry_delay(cause, attempt, base_delay, max_delay)
+                if gate is not None and isinstance(cause, openai.RateLimitError):
+                    gate.pause(delay)
+                else:
+                    await asyncio.sleep(delay)
+                continue
+            result = e.partial
+            output["error"] = str(e)
+            break
+
+    form_data, rejected = validate_fields(ALL_FIELDS, result.get("supported_fields", {}))
+    output.update(
+        form_data=form_data,
+        unsupported_fields=result.get("unsupported_fields", []),
+        rejected_fields=rejected,
+        attempts=attempt,
+        latency_s=round(time.perf_counter() - started, 3),
+    )
+    return output
+
+
+async def run(args) -> Dict[str, Any]:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise SystemExit("OPENAI_API_KEY is not set")
+
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(args.cache_path, SCHEMA_HASH)
+    # Retries are handled here, through a shared RateLimitGate, so 429s back off across the whole batch
+    index = PromptIndex(SCHEMA_HASH, min_similarity=args.similar_min_score) if args.reuse_similar else None
+    extractor = FieldExtractor(
+        FIELD_SCHEMAS, api_key=api_key, model=args.model, timeout=args.timeout, max_retries=0, cache=cache,
+        index=index, fast_model=args.fast_model, min_confidence=args.min_confidence,
+    )
+
+    input_format = args.format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * 2)
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    latencies: List[float] = []
+    summary = {"records": 0, "succeeded": 0, "failed": 0, "retries": 0}
+    gate = RateLimitGate()
+
+    async def produce():
+        for record in read_records(args.input, input_format, args.prompt_column, args.id_column):
+            await queue.put(record)
+        for _ in range(args.concurrency):
+            await queue.put(None)
+
+    async def work():
+        while True:
+            record = await queue.get()
+            if record is None:
+                return
+            result = await extract_record(extractor, record, args.max_attempts, args.base_delay, args.max_delay, gate)
+            output.write(json.dumps(result, default=str) + "\n")
+            output.flush()
+            latencies.append(result["latency_s"])
+            summary["records"] += 1
+            summary["failed" if result["error"] else "succeeded"] += 1
+            summary["retries"] += result["attempts"] - 1
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(produce(), *(work() for _ in range(args.concurrency)))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    summary.update(
+        elapsed_s=round(elapsed, 3),
+        throughput_per_s=round(summary["records"] / elapsed, 2) if elapsed else 0.0,
+        latency_p50_s=percentile(latencies, 50),
+        latency_p95_s=percentile(latencies, 95),
+        latency_max_s=latencies[-1] if latencies else None,
+    )
+    if cache is not None:
+        summary["cache"] = cache.stats()
+    if len(extractor.tiers) > 1:
+        summary["tiers"] = tier_report(REGISTRY)
+    return summary
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract credit card program fields from free-text prompts in bulk.")
+    parser.add_argument("input", help="JSONL or CSV file with one prompt per record ('-' for JSONL on stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="input format (default: from file extension)")
+    parser.add_argument("--prompt-column", default="prompt", help="column/key holding the prompt text")
+    parser.add_argument("--id-column", default="id", help="column/key identifying the record (default: line number)")
+    parser.add_argument("--concurrency", type=int, default=8, help="maximum requests in flight")
+    parser.add_argument("--max-attempts", type=int, default=6, help="attempts per record on transient errors")
+    parser.add_argument("--base-delay", type=float, default=1.0, help="initial backoff delay in seconds")
+    parser.add_argument("--max-delay", type=float, default=60.0, help="maximum backoff delay in seconds")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--model", default=os.getenv("OPENAI_MODEL", "gpt-4"))
+    parser.add_argument(
+        "--fast-model", default=os.getenv("OPENAI_FAST_MODEL") or None,
+        help="cheaper model tried first; low-confidence replies are redone with --model",
+    )
+    parser.add_argument("--min-confidence", type=float, default=0.7, help="fast model confidence needed to accept")
+    parser.add_argument("--cache-path", default=os.getenv("AI_CACHE_PATH") or ".cache/ai_responses.sqlite3")
+    parser.add_argument("--no-cache", action="store_true", help="always call the model")
+    parser.add_argument(
+        "--reuse-similar", action="store_true",
+        help="start near-duplicate prompts from an earlier record's result and only ask for the edited fields",
+    )
+    parser.add_argument("--similar-min-score", type=float, default=0.8, help="cosine similarity needed for reuse")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    summary = asyncio.run(run(args))
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""Local stand-in for the OpenAI chat completions API, for benchmarks.
+
+Answers ``POST /v1/chat/completions`` in all three output modes (tool
+call, ``response_format`` and plain text), streamed or not, after a
+configurable latency. Replies only contain the fields the request asks
+for, like a model answering a sliced schema would.
+
+Run it on its own for manual testing:
+    python benchmarks/fake_openai.py --port 8765 --latency 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 streamlit run app.py
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+# One plausible value per field; replies are filtered to the requested fields
+CANNED_FIELDS = {
+    "program_name": "Gold Rewards",
+    "program_code": "GLD2025",
+    "launch_date": "2025-08-01",
+    "program_budget": 250000,
+    "program_status": "Draft",
+    "target_audience": ["Existing Customers"],
+    "program_duration": 12,
+    "auto_renewal": True,
+    "launch_time": "09:30",
+    "program_description": "Gold tier rewards card for existing customers",
+    "product_type": "Gold Card",
+    "annual_fee": 50,
+    "credit_limit": "$5,000",
+    "interest_rate": 15.0,
+    "rewards_program": ["Cash Back", "Points"],
+    "card_features": ["Contactless", "Mobile Wallet"],
+    "activation_required": True,
+    "card_design": "Brushed gold",
+    "welcome_bonus": 200,
+    "product_notes": "No foreign transaction fees",
+    "min_age": 21,
+    "max_age": 75,
+    "min_income": 40000,
+    "credit_score_requirement": "Good (670-739)",
+    "employment_status": ["Full-time", "Self-employed"],
+    "residence_requirement": "US Resident",
+    "debt_to_income_ratio": 40,
+    "bankruptcy_allowed": False,
+    "review_time": "14:00",
+    "eligibility_notes": "Manual review above 40% DTI",
+}
+CANNED_UNSUPPORTED = ["cashback_cap"]
+
+# How the reply text is damaged, to exercise the local repair path
+REPLY_MODES = ("canned", "malformed", "truncated")
+
+
+def requested_fields(body: Dict[str, Any]) -> Optional[List[str]]:
+    """Field names in the request's JSON Schema (None in plain text mode)"""
+    schema = None
+    if body.get("tools"):
+        schema = body["tools"][0]["function"]["parameters"]
+    elif body.get("response_format", {}).get("type") == "json_schema":
+        schema = body["response_format"]["json_schema"]["schema"]
+    if schema is None:
+        return None
+    return list(schema["properties"]["supported_fields"].get("properties", {}))
+
+
+def reply_text(body: Dict[str, Any], reply_mode: str) -> str:
+    names = requested_fields(body)
+    fields = {name: value for name, value in CANNED_FIELDS.items() if names is None or name in names}
+    text = json.dumps({"supported_fields": fields, "unsupported_fields": CANNED_UNSUPPORTED})
+    if reply_mode == "malformed":
+        # Code fence, chatty preamble and a trailing comma
+        return "Here are the fields:\n```json\n" + text[:-1] + ",}\n```"
+    if reply_mode == "truncated":
+        return text[: int(len(text) * 0.7)]
+    return text
+
+
+class FakeOpenAIServer:
+    """Threaded fake API server; use as a context manager or call start/stop.
+
+    ``latency_s`` is the delay before the first byte, ``chunk_delay_s`` the
+    gap between stream chunks. ``model_reply_modes`` overrides the reply mode
+    per requested model, e.g. to make a cheap tier answer badly. Settings and
+    the request log can be changed between requests while the server runs.
+    """
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency_s: float = 0.2,
+        chunk_size: int = 16,
+        chunk_delay_s: float = 0.005,
+        reply_mode: str = "canned",
+    ):
+        if reply_mode not in REPLY_MODES:
+            raise ValueError(f"Unknown reply mode: {reply_mode}")
+        self.latency_s = latency_s
+        self.chunk_size = chunk_size
+        self.chunk_delay_s = chunk_delay_s
+        self.reply_mode = reply_mode
+        self.model_reply_modes: Dict[str, str] = {}
+        self.requests: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_log(self):
+        with self._lock:
+            self.requests.clear()
+
+    def _record(self, body: Dict[str, Any], raw_size: int):
+        with self._lock:
+            self.requests.append({"body": body, "bytes": raw_size, "received_at": time.monotonic()})
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                body = json.loads(raw)
+                server._record(body, len(raw))
+                time.sleep(server.latency_s)
+                text = reply_text(body, server.model_reply_modes.get(body.get("model"), server.reply_mode))
+                if body.get("stream"):
+                    self._stream(body, text)
+                else:
+                    self._complete(body, text)
+
+            def _complete(self, body: Dict[str, Any], text: str):
+                if body.get("tools"):
+                    message = {"role": "assistant", "content": None, "tool_calls": [_tool_call(body, text)]}
+                else:
+                    message = {"role": "assistant", "content": text}
+                payload = json.dumps({
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, body: Dict[str, Any], text: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for start in range(0, len(text), server.chunk_size):
+                    piece = text[start:start + server.chunk_size]
+                    if body.get("tools"):
+                        call = _tool_call(body, piece)
+                        if start:
+                            call["function"]["name"] = None
+                        delta = {"tool_calls": [{"index": 0, **call}]}
+                    else:
+                        delta = {"content": piece}
+                    chunk = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "fake"),
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(server.chunk_delay_s)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
+
+
+def _tool_call(body: Dict[str, Any], arguments: str) -> Dict[str, Any]:
+    return {
+        "id": "call_fake",
+        "type": "function",
+        "function": {"name": body["tools"][0]["function"]["name"], "arguments": arguments},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server for local testing.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first byte")
+    parser.add_argument("--chunk-size", type=int, default=16, help="characters per stream chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.005, help="seconds between stream chunks")
+    parser.add_argument("--reply", choices=REPLY_MODES, default="canned")
+    args = parser.parse_args(argv)
+
+    server = FakeOpenAIServer(args.port, args.latency, args.chunk_size, args.chunk_delay, args.reply)
+    print(f"Serving fake OpenAI API at {server.base_url}")
+    server.start()
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Load test of the extraction service against the fake OpenAI server.
+
+Starts the fake server and ``extraction_service`` (under uvicorn, in this
+process) and sends ``--requests`` extraction requests from ``--clients``
+concurrent clients. Prompts are drawn from ``--distinct`` variants, so
+most requests repeat a prompt that may still be in flight and get
+coalesced. Reports throughput, client latency, upstream calls per request
+and the service's counters.
+
+    python benchmarks/load_service.py --clients 32 --requests 400 --concurrency 16
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARK_DIR.parent))
+
+import uvicorn  # noqa: E402
+
+from batch_extract import percentile  # noqa: E402
+from extraction_service import build_service, create_app  # noqa: E402
+from extraction_service import parse_args as service_args  # noqa: E402
+from fake_openai import FakeOpenAIServer  # noqa: E402
+from run_benchmarks import DEFAULT_PROMPT  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def post(url: str, payload: Dict[str, Any], timeout_s: float = 120.0) -> Dict[str, Any]:
+    request = urllib.request.Request(url, json.dumps(payload).encode(), {"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout_s) as response:
+        return json.loads(response.read())
+
+
+def run_load(args) -> Dict[str, Any]:
+    with FakeOpenAIServer(latency_s=args.latency) as fake:
+        os.environ.update(OPENAI_API_KEY="sk-load-test", OPENAI_BASE_URL=fake.base_url)
+        service = build_service(service_args(["--no-cache", "--concurrency", str(args.concurrency)]))
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(create_app(service), port=port, log_level="warning", lifespan="on"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+
+        url = f"http://127.0.0.1:{port}/v1/extract"
+        prompts = [f"{DEFAULT_PROMPT} (variant {number})" for number in range(args.distinct)]
+
+        def one(number: int) -> float:
+            started = time.perf_counter()
+            result = post(url, {"id": number, "prompt": prompts[number % len(prompts)]})
+            if result["error"]:
+                raise RuntimeError(result["error"])
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.clients) as pool:
+            latencies = sorted(pool.map(one, range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+        stats = json.loads(urllib.request.urlopen(f"http://127.0.0.1:{port}/stats").read())
+        server.should_exit = True
+        thread.join()
+
+    return {
+        "requests": args.requests,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(args.requests / elapsed, 2),
+        "latency_p50_s": round(statistics.median(latencies), 4),
+        "latency_p95_s": round(percentile(latencies, 95), 4),
+        "upstream_calls": len(fake.requests),
+        "upstream_calls_per_request": round(len(fake.requests) / args.requests, 3),
+        "service": stats,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the extraction service against a fake OpenAI server.")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent HTTP clients")
+    parser.add_argument("--requests", type=int, default=400, help="requests sent in total")
+    parser.add_argument("--distinct", type=int, default=20, help="distinct prompts among the requests")
+    parser.add_argument("--concurrency", type=int, default=16, help="service extractions in flight at once")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake server seconds before the first byte")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    print(json.dumps(run_load(parse_args(argv)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
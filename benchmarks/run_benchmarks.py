@@ -0,0 +1,322 @@
+"""End-to-end benchmarks: the real app driven by AppTest against a fake OpenAI server.
+
+Each run walks the whole flow (prompt, AI fill, page 2, page 3, review,
+submit) and reports extraction latency, per-rerun render time, prompt
+size and memory per session. Results are compared with the stored
+baseline and any metric that got worse by more than the tolerance fails
+the run.
+
+    python benchmarks/run_benchmarks.py                     # compare with baseline.json
+    python benchmarks/run_benchmarks.py --update-baseline   # record a new baseline
+"""
+
+import argparse
+import gc
+import inspect
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+APP_PATH = BENCHMARK_DIR.parent / "app.py"
+BASELINE_PATH = BENCHMARK_DIR / "baseline.json"
+sys.path.insert(0, str(BENCHMARK_DIR.parent))
+
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache  # noqa: E402
+from streamlit.testing.v1 import AppTest, local_script_runner  # noqa: E402
+
+from extractor import count_tokens  # noqa: E402
+from fake_openai import FakeOpenAIServer  # noqa: E402
+from field_schemas import FIELD_SCHEMAS  # noqa: E402
+from rule_extractor import RuleExtractor  # noqa: E402
+
+# Leaves several fields to the model after rule-based pre-extraction
+DEFAULT_PROMPT = (
+    "Set up a premium travel card for students and retirees with miles rewards, "
+    "mobile wallet support and a brushed metal design; applicants need steady income"
+)
+
+# The rules place no value here, so the first streamed field comes from the model
+FIRST_FIELD_PROMPT = (
+    "Set up a card for frequent flyers who want lounge perks and a sleek look; "
+    "approval should favour people with a long banking history"
+)
+
+# (name, stream results, fake server reply mode)
+SCENARIOS = [
+    ("stream", True, "canned"),
+    ("blocking", False, "canned"),
+    ("stream_malformed", True, "malformed"),
+    ("blocking_truncated", False, "truncated"),
+]
+
+# Differences below these are noise whatever the tolerance says
+NOISE_FLOOR = {"_s": 0.05, "_ms": 5.0, "_kib": 128.0, "_chars": 0.0, "_tokens": 0.0}
+
+
+def share_script_cache():
+    """Compile the app once for all runs, as a server does until the file changes
+
+    AppTest gives every run a new script cache, so each rerun would also
+    compile app.py (and apply Streamlit's magic to it) and the render
+    times would grow with the length of the file rather than its work.
+    This replaces a private name of Streamlit's test runner, so it fails
+    loudly instead of silently timing compiles again if that name goes away.
+    """
+    runner_source = inspect.getsource(local_script_runner.LocalScriptRunner)
+    if not hasattr(local_script_runner, "ScriptCache") or "ScriptCache()" not in runner_source:
+        raise RuntimeError(
+            "streamlit.testing.v1.local_script_runner no longer creates a ScriptCache per run; "
+            "update share_script_cache for this Streamlit version"
+        )
+    cache = ScriptCache()
+    local_script_runner.ScriptCache = lambda: cache
+
+
+def new_session(server: FakeOpenAIServer) -> AppTest:
+    """A fresh browser session of the app, pointed at the fake server"""
+    at = AppTest.from_file(str(APP_PATH), default_timeout=30)
+    at.secrets["OPENAI_API_KEY"] = "sk-benchmark"
+    # Memory-only response cache, so runs do not leave files behind
+    at.secrets["AI_CACHE_PATH"] = ""
+    # Prompts only differ by a run suffix; near-duplicate reuse would skip most of the model call
+    at.secrets["AI_SIMILAR_ENABLED"] = "false"
+    # Submissions stay in memory as well
+    at.secrets["SUBMISSIONS_PATH"] = ""
+    return at.run()
+
+
+def button(at: AppTest, label: str):
+    return next(widget for widget in at.button if widget.label == label)
+
+
+def timed_run(at: AppTest) -> float:
+    """Rerun the script and return the render time in milliseconds"""
+    started = time.perf_counter()
+    at.run()
+    return (time.perf_counter() - started) * 1000
+
+
+def run_extraction(at: AppTest, prompt: str, stream: bool, timeout_s: float = 30.0) -> Dict[str, Any]:
+    """Submit a prompt on page 1 and poll until the AI job has finished"""
+    at.text_area[0].input(prompt)
+    next(widget for widget in at.toggle if widget.label.startswith("⚡")).set_value(stream)
+    started = time.perf_counter()
+    button(at, "🚀 Process with AI").click().run()
+    while at.session_state["ai_job"] is not None:
+        if time.perf_counter() - started > timeout_s:
+            raise RuntimeError("AI job did not finish in time")
+        time.sleep(0.01)
+        at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    timing = at.session_state["ai_timing"]
+    return {
+        "wall_s": time.perf_counter() - started,
+        "job_s": timing["total_s"],
+        "first_field_s": timing["first_field_s"],
+        "outcome": at.session_state["ai_outcome"],
+    }
+
+
+def rerun_times(at: AppTest, change: Callable[[AppTest, int], None], repeats: int) -> List[float]:
+    """Render times of reruns triggered by alternating widget changes"""
+    gc.collect()
+    times = []
+    for index in range(repeats):
+        change(at, index)
+        times.append(timed_run(at))
+    return times
+
+
+def toggle_checkbox(at: AppTest, index: int):
+    checkbox = next(widget for widget in at.checkbox if (widget.key or "").startswith("field_"))
+    checkbox.set_value(index % 2 == 0)
+
+
+def move_slider(at: AppTest, index: int):
+    slider = at.slider[0]
+    slider.set_value(slider.max if index % 2 == 0 else slider.min)
+
+
+def navigate_times(at: AppTest, repeats: int) -> List[float]:
+    """Move to the next page, then time "Next" into it again after going back each time"""
+    button(at, "Next ➡️").click().run()
+    gc.collect()
+    times = []
+    for _ in range(repeats):
+        button(at, "⬅️ Back").click().run()
+        started = time.perf_counter()
+        button(at, "Next ➡️").click().run()
+        times.append((time.perf_counter() - started) * 1000)
+    return times
+
+
+def walk_pages(at: AppTest, repeats: int) -> Dict[str, float]:
+    """Page 1 → 2 → 3 → review → submit, timing reruns on every page"""
+    metrics = {"page1_rerun_ms": statistics.median(rerun_times(at, toggle_checkbox, repeats))}
+
+    for page, change in (("page2", toggle_checkbox), ("page3", move_slider), ("review", None)):
+        metrics[f"{page}_navigate_ms"] = statistics.median(navigate_times(at, repeats))
+        if change is not None:
+            metrics[f"{page}_rerun_ms"] = statistics.median(rerun_times(at, change, repeats))
+        else:
+            metrics[f"{page}_rerun_ms"] = statistics.median(timed_run(at) for _ in range(repeats))
+
+    submit_times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        button(at, "🚀 Submit Program").click().run()
+        submit_times.append((time.perf_counter() - started) * 1000)
+    metrics["submit_ms"] = statistics.median(submit_times)
+    if not any("submitted successfully" in element.value for element in at.success):
+        raise RuntimeError("Submit did not succeed")
+    return metrics
+
+
+def prompt_size(server: FakeOpenAIServer) -> Dict[str, float]:
+    """Size of the last request's prompt: system message plus the output schema"""
+    body = server.requests[-1]["body"]
+    text = "".join(message["content"] for message in body["messages"] if message["role"] == "system")
+    for option in ("tools", "response_format"):
+        if option in body:
+            text += json.dumps(body[option], separators=(",", ":"))
+    return {"prompt_chars": len(text), "prompt_tokens": count_tokens(text, body.get("model", "gpt-4"))}
+
+
+def session_memory_kib(server: FakeOpenAIServer, prompt: str, sessions: int) -> float:
+    """Memory retained per session after a full AI fill and page walk"""
+    walk = lambda at: (run_extraction(at, f"{prompt} (memory)", True), walk_pages(at, 1))  # noqa: E731
+    # Warm-up session, so shared caches and imports are not charged to the sessions
+    walk(new_session(server))
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        kept = []
+        for _ in range(sessions):
+            at = new_session(server)
+            walk(at)
+            kept.append(at)
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (after - before) / sessions / 1024
+
+
+def run_benchmarks(args) -> Dict[str, float]:
+    metrics: Dict[str, float] = {}
+    with FakeOpenAIServer(latency_s=args.latency, chunk_delay_s=args.chunk_delay) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+
+        if RuleExtractor(FIELD_SCHEMAS).extract(args.first_field_prompt)["supported_fields"]:
+            raise RuntimeError("The rules fill fields of --first-field-prompt; pick one they cannot touch")
+
+        for name, stream, reply_mode in SCENARIOS:
+            server.reply_mode = reply_mode
+            wall, first_field, requests = [], [], 0
+            for iteration in range(args.iterations):
+                at = new_session(server)
+                server.reset_log()
+                # A new prompt every time, so the response cache never answers
+                result = run_extraction(at, f"{args.prompt} (run {name} {iteration})", stream)
+                if result["outcome"] and result["outcome"][0][0] == "error":
+                    raise RuntimeError(f"{name}: {result['outcome'][0][1]}")
+                wall.append(result["wall_s"])
+                requests += len(server.requests)
+                if stream:
+                    # Rule fields of --prompt are reported before the request, so time the model with another prompt
+                    prompt = f"{args.first_field_prompt} (run {name} {iteration})"
+                    result = run_extraction(new_session(server), prompt, stream)
+                    if result["first_field_s"] is not None:
+                        first_field.append(result["first_field_s"])
+            if not requests:
+                raise RuntimeError("The prompt never reached the model; pick one the rules cannot fully cover")
+            metrics[f"extract_{name}_s"] = statistics.median(wall)
+            if stream and first_field:
+                metrics[f"first_field_{name}_s"] = statistics.median(first_field)
+
+        server.reply_mode = "canned"
+        metrics.update(prompt_size(server))
+
+        # Same prompt again: answered from the response cache
+        at = new_session(server)
+        run_extraction(at, f"{args.prompt} (run stream 0)", True)
+        metrics["extract_cached_s"] = at.session_state["ai_timing"]["total_s"]
+        metrics.update(walk_pages(at, args.repeats))
+
+        metrics["memory_per_session_kib"] = session_memory_kib(server, args.prompt, args.sessions)
+    return {name: round(value, 4) for name, value in metrics.items()}
+
+
+def compare(metrics: Dict[str, float], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Metrics worse than baseline × (1 + tolerance), beyond their noise floor"""
+    regressions = []
+    for name, reference in baseline.get("metrics", {}).items():
+        current = metrics.get(name)
+        if current is None:
+            continue
+        floor = next((value for suffix, value in NOISE_FLOOR.items() if name.endswith(suffix)), 0.0)
+        limit = reference * (1 + tolerance) + floor
+        if current > limit:
+            regressions.append(f"{name}: {current:g} > {limit:g} (baseline {reference:g})")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app end to end against a fake OpenAI server.")
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT)
+    parser.add_argument(
+        "--first-field-prompt", default=FIRST_FIELD_PROMPT, help="prompt timed to its first streamed field"
+    )
+    parser.add_argument("--iterations", type=int, default=3, help="AI fills per scenario")
+    parser.add_argument("--repeats", type=int, default=10, help="timed reruns per page")
+    parser.add_argument("--sessions", type=int, default=5, help="sessions kept alive for the memory measurement")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake server seconds before the first byte")
+    parser.add_argument("--chunk-delay", type=float, default=0.005, help="fake server seconds between stream chunks")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, help="allowed slowdown (default: from the baseline file, else 0.25)")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    share_script_cache()
+    metrics = run_benchmarks(args)
+    for name, value in metrics.items():
+        print(f"{name:28} {value:>12g}")
+    if args.json:
+        args.json.write_text(json.dumps({"metrics": metrics}, indent=2) + "\n")
+
+    if args.update_baseline:
+        tolerance = args.tolerance if args.tolerance is not None else 0.25
+        args.baseline.write_text(json.dumps({"tolerance": tolerance, "metrics": metrics}, indent=2) + "\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to record one")
+        return 0
+    baseline = json.loads(args.baseline.read_text())
+    tolerance = args.tolerance if args.tolerance is not None else baseline.get("tolerance", 0.25)
+    regressions = compare(metrics, baseline, tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {tolerance:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\nNo regressions beyond {tolerance:.0%} of the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
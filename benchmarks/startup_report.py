@@ -0,0 +1,153 @@
+"""Cold-start report: import time of the app's modules and first-render latency of a new process and session.
+
+Every measurement runs in fresh interpreters, so nothing is imported yet:
+
+- imports: ``python -X importtime`` over the modules ``app.py`` imports at
+  the top, cumulative milliseconds per module (Streamlit itself listed
+  separately) and whether the openai SDK got pulled in;
+- render: the first script run of a new process (the app's imports,
+  schema load and first page), the first run of a second session in the
+  same process, a rerun, and the import cost moved to the first AI use.
+
+Medians over ``--runs`` processes. With ``--budget-ms`` the run fails
+when the cold first render is slower.
+
+    python benchmarks/startup_report.py
+    python benchmarks/startup_report.py --runs 5 --budget-ms 600
+"""
+
+import argparse
+import ast
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+APP_PATH = BENCHMARK_DIR.parent / "app.py"
+
+# Only needed once the user runs an extraction
+LAZY_MODULES = ("openai", "extractor", "ai_jobs", "prompt_index")
+
+RENDER_SCRIPT = """
+import json, os, sys, time
+os.environ.update(OPENAI_API_KEY="sk-startup", AI_CACHE_PATH="", SUBMISSIONS_PATH="")
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+timings = {"streamlit_import_ms": time.perf_counter() - started}
+
+def first_run():
+    at = AppTest.from_file(sys.argv[1], default_timeout=60)
+    started = time.perf_counter()
+    at.run()
+    if at.exception:
+        raise SystemExit(at.exception[0].message)
+    return at, time.perf_counter() - started
+
+at, timings["cold_first_render_ms"] = first_run()
+lazy_loaded = [name for name in sys.argv[2:] if name in sys.modules]
+_, timings["new_session_first_render_ms"] = first_run()
+started = time.perf_counter()
+at.run()
+timings["rerun_ms"] = time.perf_counter() - started
+started = time.perf_counter()
+import ai_jobs, extractor, prompt_index
+timings["first_ai_import_ms"] = time.perf_counter() - started
+print(json.dumps({"timings": {k: v * 1000 for k, v in timings.items()}, "lazy_loaded": lazy_loaded}))
+"""
+
+
+def app_imports() -> List[str]:
+    """Top-level modules ``app.py`` imports at the top of the script"""
+    modules = []
+    for node in ast.parse(APP_PATH.read_text()).body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+    return modules
+
+
+def import_breakdown() -> Dict[str, Any]:
+    """Cumulative import milliseconds per module of ``app_imports`` in a fresh interpreter"""
+    modules = app_imports()
+    code = "; ".join(f"import {name}" for name in modules)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_PATH.parent, capture_output=True, text=True, check=True,
+    )
+    cumulative: Dict[str, float] = {}
+    imported = set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line.split("|")
+        imported.add(name.strip())
+        # Only top-level lines (one space of indent), so nested imports are not counted twice
+        if total.strip().isdigit() and len(name) - len(name.lstrip()) == 1:
+            cumulative[name.strip()] = int(total) / 1000
+    # A module first imported by an earlier one is counted there
+    per_module = {name: round(cumulative.get(name, 0.0), 1) for name in modules}
+    return {
+        "modules_ms": dict(sorted(per_module.items(), key=lambda item: -item[1])),
+        "total_ms": round(sum(per_module.values()), 1),
+        "lazy_loaded": [name for name in LAZY_MODULES if name in imported],
+    }
+
+
+def render_timings() -> Dict[str, Any]:
+    completed = subprocess.run(
+        [sys.executable, "-c", RENDER_SCRIPT, str(APP_PATH), *LAZY_MODULES],
+        cwd=APP_PATH.parent, capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def startup_report(runs: int) -> Dict[str, Any]:
+    imports = [import_breakdown() for _ in range(runs)]
+    renders = [render_timings() for _ in range(runs)]
+    return {
+        "imports_ms": {
+            name: round(statistics.median(run["modules_ms"][name] for run in imports), 1)
+            for name in imports[0]["modules_ms"]
+        },
+        "app_imports_total_ms": round(statistics.median(run["total_ms"] for run in imports), 1),
+        "render_ms": {
+            name: round(statistics.median(run["timings"][name] for run in renders), 1)
+            for name in renders[0]["timings"]
+        },
+        # Heavy modules imported before any AI use; should stay empty
+        "eagerly_imported": sorted({name for run in imports + renders for name in run["lazy_loaded"]}),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Report import time and first-render latency of the app.")
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per measurement")
+    parser.add_argument("--budget-ms", type=float, help="fail when the cold first render takes longer")
+    parser.add_argument("--json", type=Path, help="also write the report to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = startup_report(args.runs)
+    print(json.dumps(report, indent=2))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2) + "\n")
+
+    failures = []
+    if report["eagerly_imported"]:
+        failures.append(f"imported before first AI use: {', '.join(report['eagerly_imported'])}")
+    cold = report["render_ms"]["cold_first_render_ms"]
+    if args.budget_ms is not None and cold > args.budget_ms:
+        failures.append(f"cold first render {cold:g} ms is over the {args.budget_ms:g} ms budget")
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""Prompt-to-fields extraction as a local JSON HTTP service (ASGI), for clients other than the Streamlit UI.
+
+Run it with uvicorn (in requirements.txt):
+    python extraction_service.py --port 8080 --concurrency 16
+
+    curl -s localhost:8080/v1/extract -d '{"prompt": "Gold card launching 2025-08-01 with a $50 annual fee"}'
+    curl -s localhost:8080/v1/extract/batch -d '{"records": [{"id": "a", "prompt": "..."}, {"id": "b", "prompt": "..."}]}'
+
+Endpoints:
+    POST /v1/extract        {"prompt", "id"?} -> one result
+    POST /v1/extract/batch  {"records": [{"prompt", "id"?}, ...]} or {"prompts": [...]} -> {"results": [...]}
+    GET  /health            liveness
+    GET  /stats             request, coalescing, cache and tier counters
+    GET  /metrics           Prometheus text of the shared metrics registry
+
+Results have the shape written by ``batch_extract.py`` (validated
+``form_data``, ``unsupported_fields``, ``rejected_fields``, ``error``,
+``attempts``, ``latency_s``) plus ``coalesced``.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+try:
+    import uvicorn
+except ImportError:  # optional; only needed to serve over HTTP, the ASGI app works under any server
+    uvicorn = None
+
+from batch_extract import RateLimitGate, extract_record
+from extractor import FieldExtractor
+from field_schemas import FIELD_SCHEMAS, SCHEMA_HASH
+from metrics import REGISTRY
+from model_tiers import tier_report
+from response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# Largest request body and batch accepted
+MAX_BODY_BYTES = 1_000_000
+MAX_BATCH_RECORDS = 100
+
+
+class RequestError(ValueError):
+    """A client error, answered with ``status`` and the message"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class ExtractionService:
+    """Extraction shared by all requests of the process.
+
+    At most ``concurrency`` extractions run at once (further requests
+    wait for a slot), all of them on the extractor's single async OpenAI
+    client, so its connection pool is reused across requests. Requests
+    for a prompt that is already being extracted (ignoring whitespace)
+    wait for that extraction instead of starting another one; it keeps
+    running if the request that started it goes away. Transient API
+    errors are retried with backoff as in ``batch_extract.py``, and a 429
+    pauses all extractions for its Retry-After delay.
+    """
+
+    def __init__(
+        self,
+        extractor: FieldExtractor,
+        concurrency: int = 8,
+        max_attempts: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        self.extractor = extractor
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {"requests": 0, "coalesced": 0, "extractions": 0, "failed": 0}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._gate = RateLimitGate()
+
+    async def extract(self, prompt: str, record_id: Any = None) -> Dict[str, Any]:
+        """Extract one prompt, joining an identical extraction already in flight"""
+        self.stats["requests"] += 1
+        key = " ".join(prompt.split())
+        task = self._in_flight.get(key)
+        coalesced = task is not None
+        if coalesced:
+            self.stats["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(self._run(prompt))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        REGISTRY.inc("service_requests", outcome="coalesced" if coalesced else "extracted")
+        # Shielded: a client disconnecting must not cancel the extraction other requests wait for
+        result = await asyncio.shield(task)
+        return {**result, "id": record_id, "coalesced": coalesced}
+
+    async def extract_many(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return await asyncio.gather(*(self.extract(record["prompt"], record.get("id")) for record in records))
+
+    async def _run(self, prompt: str) -> Dict[str, Any]:
+        async with self._slots:
+            self.stats["extractions"] += 1
+            with REGISTRY.span("service", stage="extract"):
+                result = await extract_record(
+                    self.extractor, {"id": None, "prompt": prompt},
+                    self.max_attempts, self.base_delay, self.max_delay, self._gate,
+                )
+        if result["error"]:
+            self.stats["failed"] += 1
+        return result
+
+    def report(self) -> Dict[str, Any]:
+        report = {**self.stats, "in_flight": len(self._in_flight), "concurrency": self.concurrency}
+        if self.extractor.cache is not None:
+            report["cache"] = self.extractor.cache.stats()
+        if len(self.extractor.tiers) > 1:
+            report["tiers"] = tier_report(REGISTRY)
+        return report
+
+
+def parse_records(body: Any) -> List[Dict[str, Any]]:
+    """Batch records from ``{"records": [...]}`` or ``{"prompts": [...]}``"""
+    if not isinstance(body, dict):
+        raise RequestError("expected a JSON object")
+    if "prompts" in body:
+        records = [{"id": number, "prompt": prompt} for number, prompt in enumerate(body["prompts"] or [], start=1)]
+    else:
+        records = body.get("records")
+    if not isinstance(records, list) or not records:
+        raise RequestError("expected a non-empty \"records\" or \"prompts\" list")
+    if len(records) > MAX_BATCH_RECORDS:
+        raise RequestError(f"at most {MAX_BATCH_RECORDS} records per batch", status=413)
+    for record in records:
+        check_prompt(record)
+    return records
+
+
+def check_prompt(record: Any) -> Dict[str, Any]:
+    if not isinstance(record, dict) or not isinstance(record.get("prompt"), str) or not record["prompt"].strip():
+        raise RequestError("every record needs a non-empty \"prompt\" string")
+    return record
+
+
+def create_app(service: ExtractionService) -> Callable[..., Awaitable[None]]:
+    """The ASGI application serving ``service``"""
+
+    async def handle(method: str, path: str, receive) -> Tuple[int, Any]:
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/stats":
+            return 200, service.report()
+        if path == "/metrics":
+            return 200, REGISTRY.prometheus_text()
+        if path not in ("/v1/extract", "/v1/extract/batch"):
+            raise RequestError("not found", status=404)
+        if method != "POST":
+            raise RequestError("use POST", status=405)
+
+        body = await read_json(receive)
+        if path == "/v1/extract":
+            record = check_prompt(body)
+            return 200, await service.extract(record["prompt"], record.get("id"))
+        return 200, {"results": await service.extract_many(parse_records(body))}
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            await lifespan(service, receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        try:
+            status, payload = await handle(scope["method"], scope["path"], receive)
+        except RequestError as e:
+            status, payload = e.status, {"error": str(e)}
+        except Exception as e:
+            logger.exception("Extraction request failed")
+            status, payload = 500, {"error": str(e)}
+        await send_response(send, status, payload)
+
+    return app
+
+
+async def read_json(receive) -> Any:
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise RequestError("client disconnected")
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise RequestError(f"request body over {MAX_BODY_BYTES} bytes", status=413)
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            break
+    try:
+        return json.loads(b"".join(chunks))
+    except ValueError as e:
+        raise RequestError(f"invalid JSON: {e}") from e
+
+
+async def send_response(send, status: int, payload: Any):
+    if isinstance(payload, str):
+        body, content_type = payload.encode(), b"text/plain; version=0.0.4"
+    else:
+        body, content_type = json.dumps(payload, default=str).encode(), b"application/json"
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def lifespan(service: ExtractionService, receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await service.extractor.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+def build_service(args) -> ExtractionService:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise SystemExit("OPENAI_API_KEY is not set")
+    cache = None if args.no_cache else ResponseCache(args.cache_path, SCHEMA_HASH)
+    # Retries are handled by the service so 429s back off across all extractions
+    extractor = FieldExtractor(
+        FIELD_SCHEMAS, api_key=api_key, model=args.model, timeout=args.timeout, max_retries=0, cache=cache,
+        fast_model=args.fast_model, min_confidence=args.min_confidence,
+    )
+    return ExtractionService(extractor, args.concurrency, args.max_attempts, args.base_delay, args.max_delay)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve credit card program field extraction over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--concurrency", type=int, default=8, help="extractions in flight at once")
+    parser.add_argument("--max-attempts", type=int, default=6, help="attempts per extraction on transient errors")
+    parser.add_argument("--base-delay", type=float, default=1.0, help="initial backoff delay in seconds")
+    parser.add_argument("--max-delay", type=float, default=60.0, help="maximum backoff delay in seconds")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--model", default=os.getenv("OPENAI_MODEL", "gpt-4"))
+    parser.add_argument(
+        "--fast-model", default=os.getenv("OPENAI_FAST_MODEL") or None,
+        help="cheaper model tried first; low-confidence replies are redone with --model",
+    )
+    parser.add_argument("--min-confidence", type=float, default=0.7, help="fast model confidence needed to accept")
+    parser.add_argument("--cache-path", default=os.getenv("AI_CACHE_PATH") or ".cache/ai_responses.sqlite3")
+    parser.add_argument("--no-cache", action="store_true", help="always call the model")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if uvicorn is None:
+        print("Install uvicorn to serve the extraction API (pip install uvicorn)", file=sys.stderr)
+        return 1
+    logging.basicConfig(level=logging.INFO)
+    app = create_app(build_service(args))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", lifespan="on")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
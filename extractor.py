@@ -0,0 +1,792 @@
+"""Reusable prompt-to-fields extractor built once per process"""
+
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import openai
+
+try:
+    import tiktoken
+except ImportError:  # optional; token counts fall back to a character estimate
+    tiktoken = None
+
+from field_validation import validate_fields, validate_value
+from json_stream import SupportedFieldsParser
+from metrics import REGISTRY
+from model_tiers import assess_result, parse_checked
+from prompt_index import PromptIndex
+from response_cache import ResponseCache, make_cache_key
+from rule_extractor import RuleExtractor, split_clauses
+from structured_output import FORM_TOOL_NAME, build_json_schema
+
+logger = logging.getLogger(__name__)
+
+# API errors worth retrying; anything else fails the extraction immediately
+TRANSIENT_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+# Failures of a cheaper tier that the next, larger model may not have: an
+# unusable reply, or a request the model rejects (e.g. no tool support)
+ESCALATION_ERRORS = (ValueError, openai.BadRequestError, openai.NotFoundError)
+
+
+def retry_delay(error: Exception, attempt: int, base_delay: float, max_delay: float) -> float:
+    """Seconds to wait before the next attempt, honouring Retry-After on 429s"""
+    response = getattr(error, "response", None)
+    if isinstance(error, openai.RateLimitError) and response is not None:
+        retry_after = response.headers.get("retry-after")
+        try:
+            if retry_after is not None:
+                return min(max_delay, float(retry_after))
+        except ValueError:
+            pass
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+
+def build_field_descriptions(field_schemas: Dict[str, Dict]) -> Dict[str, Dict[str, Any]]:
+    """Flatten all pages into the field descriptions shown to the model"""
+    field_descriptions = {}
+    for page_fields in field_schemas.values():
+        for field_name, field_info in page_fields.items():
+            field_descriptions[field_name] = {
+                "type": field_info["type"],
+                "label": field_info["label"]
+            }
+            if "options" in field_info:
+                field_descriptions[field_name]["options"] = field_info["options"]
+    return field_descriptions
+
+
+def build_compact_schema(field_schemas: Dict[str, Dict]) -> str:
+    """Minified field encoding: short keys, shared option lists, labels only when needed.
+
+    Each field maps to ``{"t": type}`` plus ``"l"`` (label, omitted when it
+    just repeats the field name), ``"o"`` (index into the shared
+    ``"options"`` table) and ``"r"`` ([min, max] for sliders).
+    """
+    fields = {}
+    option_lists = []
+    for page_fields in field_schemas.values():
+        for field_name, field_info in page_fields.items():
+            entry = {"t": field_info["type"]}
+            if field_info["label"].lower() != field_name.replace("_", " "):
+                entry["l"] = field_info["label"]
+            if "options" in field_info:
+                if field_info["options"] not in option_lists:
+                    option_lists.append(field_info["options"])
+                entry["o"] = option_lists.index(field_info["options"])
+            if field_info["type"] == "slider":
+                entry["r"] = [field_info.get("min", 0), field_info.get("max", 100)]
+            fields[field_name] = entry
+    return json.dumps({"fields": fields, "options": option_lists}, separators=(",", ":"), ensure_ascii=False)
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """Token count via tiktoken when installed, otherwise roughly four characters per token"""
+    if tiktoken is not None:
+        try:
+            return len(tiktoken.encoding_for_model(model).encode(text))
+        except KeyError:
+            pass
+    return math.ceil(len(text) / 4)
+
+
+def select_fields(field_schemas: Dict[str, Dict], field_names: Sequence[str]) -> Dict[str, Dict]:
+    """Subset of the schemas containing only ``field_names`` (pages without them are dropped)"""
+    wanted = set(field_names)
+    subset = {}
+    for page_key, page_fields in field_schemas.items():
+        page_subset = {name: info for name, info in page_fields.items() if name in wanted}
+        if page_subset:
+            subset[page_key] = page_subset
+    return subset
+
+
+def build_system_prompt(
+    field_schemas: Dict[str, Dict], compact: bool = True, output_mode: str = "text", delta: bool = False
+) -> str:
+    """Build the extraction system prompt for the given field schemas
+    
+    In the structured output modes ("tools", "json_schema") the fields are
+    described by the JSON Schema sent with the request, so the prompt only
+    carries the instructions. With ``delta`` the prompt is for follow-ups
+    (see ``build_followup_message``): only changed fields are returned.
+    """
+    intro = "You are an AI assistant that extracts credit card program information from natural language descriptions."
+    rules = """- Only include fields that can be reasonably inferred from the prompt
+- For date fields, use YYYY-MM-DD format
+- For time fields, use HH:MM:SS format
+- For select/radio fields, use exact option values from the available options
+- For multiselect fields, return arrays of option values
+- For boolean fields (checkbox), use true/false
+- If a field is mentioned but not supported, include it in a special "unsupported_fields" array"""
+    if delta:
+        intro = (
+            "You are an AI assistant that updates a filled-in credit card program form. "
+            "The user gives the current values and a change request."
+        )
+        rules += "\n- Only include fields the change request sets or changes; leave out fields that stay the same"
+
+    if output_mode == "tools":
+        return f"""{intro}
+
+Call the {FORM_TOOL_NAME} function with the information from the user's prompt.
+{rules}"""
+    if output_mode == "json_schema":
+        return f"""{intro}
+
+Extract the information from the user's prompt into the response schema.
+{rules}"""
+
+    if compact:
+        fields_section = (
+            "Available fields (t=type, l=label when it differs from the field name, "
+            "o=index into \"options\", r=[min,max]):\n" + build_compact_schema(field_schemas)
+        )
+    else:
+        fields_section = (
+            "Available fields and their types:\n" + json.dumps(build_field_descriptions(field_schemas), indent=2)
+        )
+    return f"""{intro}
+
+{fields_section}
+
+Based on the user's prompt, extract relevant information and return it as a JSON object.
+{rules}
+
+Return the response in this format:
+{{
+  "supported_fields": {{
+    "field_name": "value",
+    ...
+  }},
+  "unsupported_fields": ["field1", "field2", ...]
+}}
+
+Only return valid JSON without any additional text."""
+
+
+def build_followup_message(instruction: str, current_values: Dict[str, Any]) -> str:
+    """User message of a follow-up: the relevant current values and the change request"""
+    current = json.dumps(current_values, separators=(",", ":"), ensure_ascii=False, default=str)
+    return f"Current values: {current}\n\nChange request: {instruction}"
+
+
+# Separates the dropped clauses of a follow-up instruction from the added ones
+REMOVED_MARKER = "No longer: "
+
+
+def followup_instruction(previous_prompt: str, prompt: str, rules: Optional[RuleExtractor] = None) -> str:
+    """What a follow-up has to send: the clauses added to (or dropped from) the previous prompt.
+
+    A prompt that shares no clause with the previous one is taken to be a
+    short instruction ("change the fee to $75") and returned as is. With
+    ``rules``, a dropped clause is left out when an added clause names one
+    of its fields, so an edited value is sent once rather than as old and
+    new. Returns an empty string when nothing changed.
+    """
+    old_clauses, new_clauses = split_clauses(previous_prompt), split_clauses(prompt)
+    if not old_clauses.keys() & new_clauses.keys():
+        return prompt.strip()
+    added = [clause for key, clause in new_clauses.items() if key not in old_clauses]
+    removed = [clause for key, clause in old_clauses.items() if key not in new_clauses]
+    if rules is not None and added and removed:
+        def named(text: str) -> set:
+            return set(rules.relevant_fields(text, keep_text_fields=False, match_values=False))
+
+        covered = named("; ".join(added))
+        removed = [clause for clause in removed if not named(clause) & covered]
+    parts = []
+    if added:
+        parts.append("; ".join(added))
+    if removed:
+        parts.append(REMOVED_MARKER + "; ".join(removed))
+    return ". ".join(parts)
+
+
+class ExtractionError(Exception):
+    """Raised when the model call fails; ``partial`` keeps what was resolved locally"""
+
+    def __init__(self, message: str, partial: Dict[str, Any]):
+        super().__init__(message)
+        self.partial = partial
+
+
+class FieldExtractor:
+    """Holds the compiled system prompts and a long-lived OpenAI client.
+
+    Create one instance per process and share it between sessions: the
+    client keeps its HTTP connection pool (and TLS sessions) alive across
+    requests, so each extraction only pays for the network call itself.
+
+    Every prompt first goes through the rule-based ``RuleExtractor``. Only
+    the fields it could not resolve are put in front of the model, and the
+    model is skipped entirely when the rules covered the whole prompt. With
+    an ``index``, a prompt that closely resembles an earlier one starts from
+    that prompt's result and only the fields touched by the edited clauses
+    go to the model.
+
+    ``output_mode`` selects how the reply is constrained: "tools" (function
+    calling with a JSON Schema generated from the field schemas, the
+    default), "json_schema" (structured ``response_format``) or "text"
+    (plain JSON described in the prompt). Replies are repaired locally when
+    malformed or truncated and every value is validated against its field.
+
+    With a ``fast_model`` requests go to that model first. Its reply is
+    scored (see ``model_tiers.assess_result``) and the request is repeated
+    on ``model`` only when the score is below ``min_confidence`` or the
+    fast model failed. When streaming, the fast model's fields are only
+    reported once its reply is accepted, so an escalated reply never
+    reaches the form.
+    """
+
+    def __init__(
+        self,
+        field_schemas: Dict[str, Dict],
+        api_key: str,
+        model: str = "gpt-4",
+        temperature: float = 0.3,
+        max_tokens: int = 1000,
+        timeout: float = 60.0,
+        connect_timeout: float = 5.0,
+        max_retries: int = 2,
+        cache: Optional[ResponseCache] = None,
+        output_mode: str = "tools",
+        index: Optional[PromptIndex] = None,
+        fast_model: Optional[str] = None,
+        min_confidence: float = 0.7,
+    ):
+        if output_mode not in ("tools", "json_schema", "text"):
+            raise ValueError(f"Unknown output mode: {output_mode}")
+        self.field_schemas = field_schemas
+        self.model_params = {"model": model, "temperature": temperature, "max_tokens": max_tokens}
+        # Models to try in order, cheapest first; the last one's answer is always accepted
+        self.tiers = (fast_model, model) if fast_model and fast_model != model else (model,)
+        self.min_confidence = min_confidence
+        self.output_mode = output_mode
+        self.system_prompt = build_system_prompt(field_schemas, output_mode=output_mode)
+        self.rules = RuleExtractor(field_schemas)
+        self.cache = cache
+        self.index = index
+        self._client_options = {
+            "api_key": api_key,
+            "timeout": openai.Timeout(timeout, connect=connect_timeout),
+            "max_retries": max_retries,
+        }
+        self.client = openai.OpenAI(**self._client_options)
+        self._async_client = None
+        self._all_fields = tuple(self.rules.fields)
+        self._request_specs: Dict[Tuple[Tuple[str, ...], bool], Tuple[str, Dict[str, Any], int]] = {}
+        # "full" is the original text prompt with indented field descriptions; "request" is what this
+        # output mode sends for all fields (the compact encoding only in "text" mode, the JSON Schema otherwise)
+        self.prompt_tokens = {
+            "full": count_tokens(build_system_prompt(field_schemas, compact=False), model),
+            "request": self._request_spec(self._all_fields)[2],
+        }
+
+    def extract(
+        self,
+        prompt: str,
+        on_field: Optional[Callable[[str, Any], None]] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Extract field values from the prompt.
+
+        When ``on_field`` is given the completion is streamed and the callback
+        receives each field (rule-based ones first) as soon as it is known.
+        ``timeout`` overrides the client's request timeout for this call.
+        Returns ``{"supported_fields": {...}, "unsupported_fields": [...]}``;
+        model or parsing failures raise ``ExtractionError``.
+        """
+        fields, residual, unsupported = self._plan(prompt)
+        if on_field:
+            for field_name, value in fields.items():
+                on_field(field_name, value)
+        if not residual:
+            return self._remember(prompt, {"supported_fields": fields, "unsupported_fields": unsupported})
+
+        try:
+            model_result = self._complete(prompt, residual, self._model_field_callback(fields, on_field), timeout)
+        except Exception as e:
+            raise ExtractionError(str(e), {"supported_fields": fields, "unsupported_fields": unsupported}) from e
+        return self._remember(prompt, self._merge(fields, model_result))
+
+    def extract_delta(
+        self,
+        instruction: str,
+        current_values: Dict[str, Any],
+        on_field: Optional[Callable[[str, Any], None]] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Follow-up on a filled form: return only the fields ``instruction`` changes.
+
+        ``instruction`` is a short change request or the text added to an
+        earlier prompt; ``current_values`` are the form's JSON-friendly
+        values. The rules run on the instruction first, and the model only
+        sees the fields the instruction is about together with their current
+        values, so a follow-up is a small request. Values equal to the
+        current ones are left out of the result.
+        """
+        # The rules only see the added text; values in dropped clauses are not to be set again
+        added, _, removed = instruction.partition(REMOVED_MARKER)
+        fields, residual = self._pre_extract(added) if added.strip() else ({}, ())
+        if residual:
+            # A value the rules placed ("$75") says nothing about the other money fields
+            relevant = set(self.rules.relevant_fields(added, match_values=not fields))
+            residual = tuple(name for name in residual if name in relevant)
+        if removed:
+            dropped = set(self.rules.relevant_fields(removed, keep_text_fields=False, match_values=False))
+            residual += tuple(
+                name for name in self.rules.fields if name in dropped and name not in residual and name not in fields
+            )
+        fields = {name: value for name, value in fields.items() if current_values.get(name) != value}
+        if on_field:
+            for field_name, value in fields.items():
+                on_field(field_name, value)
+        if not residual:
+            return {"supported_fields": fields, "unsupported_fields": []}
+
+        message = build_followup_message(
+            instruction, {name: current_values[name] for name in residual if name in current_values}
+        )
+        try:
+            model_result = self._complete(
+                message, residual, self._model_field_callback(fields, on_field, current_values), timeout, delta=True
+            )
+        except Exception as e:
+            raise ExtractionError(str(e), {"supported_fields": fields, "unsupported_fields": []}) from e
+        result = self._merge(fields, model_result)
+        result["supported_fields"] = {
+            name: value for name, value in result["supported_fields"].items() if current_values.get(name) != value
+        }
+        return result
+
+    def _model_field_callback(
+        self,
+        fields: Dict[str, Any],
+        on_field: Optional[Callable[[str, Any], None]],
+        current_values: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Callable[[str, Any], None]]:
+        """Wrap ``on_field`` for streamed model fields (None when not streaming)"""
+        if on_field is None:
+            return None
+
+        def on_model_field(field_name: str, value: Any):
+            # Values resolved by the rules win over anything the model repeats (a
+            # multiselect is combined with them), and values that fail validation
+            # never reach the form
+            if field_name not in self.rules.fields:
+                return
+            if field_name in fields and not isinstance(fields[field_name], list):
+                return
+            try:
+                value = validate_value(self.rules.fields[field_name], value)
+            except (TypeError, ValueError):
+                return
+            if field_name in fields:
+                value = self._combine(field_name, fields[field_name], value)
+            if current_values is None or current_values.get(field_name) != value:
+                on_field(field_name, value)
+
+        return on_model_field
+
+    async def aextract(self, prompt: str) -> Dict[str, Any]:
+        """Async variant of ``extract`` (without streaming) for batch and service use"""
+        fields, residual, unsupported = self._plan(prompt)
+        if not residual:
+            return self._remember(prompt, {"supported_fields": fields, "unsupported_fields": unsupported})
+
+        try:
+            model_result = await self._acomplete(prompt, residual)
+        except Exception as e:
+            raise ExtractionError(str(e), {"supported_fields": fields, "unsupported_fields": unsupported}) from e
+        return self._remember(prompt, self._merge(fields, model_result))
+
+    def _plan(self, prompt: str) -> Tuple[Dict[str, Any], Tuple[str, ...], List[str]]:
+        """Fields known without the model, the fields to ask it for, and inherited unsupported fields"""
+        fields, residual = self._pre_extract(prompt)
+        if self.index is None or not residual:
+            return fields, residual, []
+
+        with REGISTRY.span("ai", stage="similar"):
+            reuse = self._reuse_neighbor(prompt, residual)
+        REGISTRY.inc("ai_similar_lookups", result="miss" if reuse is None else "reused")
+        if reuse is None:
+            return fields, residual, []
+        base, residual, unsupported = reuse
+        return {**base, **fields}, residual, unsupported
+
+    def _reuse_neighbor(
+        self, prompt: str, residual: Tuple[str, ...]
+    ) -> Optional[Tuple[Dict[str, Any], Tuple[str, ...], List[str]]]:
+        """Start from the result of the most similar earlier prompt.
+
+        The two prompts are compared clause by clause. Fields mentioned in
+        clauses that were added or removed are dropped from the neighbour's
+        result and are the only ones left for the model; everything else is
+        reused. Returns None when there is no close neighbour or an added
+        clause cannot be tied to any field.
+        """
+        neighbor = self.index.nearest(prompt)
+        if neighbor is None:
+            return None
+
+        old_clauses, new_clauses = split_clauses(neighbor.prompt), split_clauses(prompt)
+        added = [clause for key, clause in new_clauses.items() if key not in old_clauses]
+        removed = [clause for key, clause in old_clauses.items() if key not in new_clauses]
+        changed = set()
+        if added:
+            changed.update(self.rules.relevant_fields("; ".join(added), keep_text_fields=False))
+            if not changed:
+                return None
+        if removed:
+            changed.update(self.rules.relevant_fields("; ".join(removed), keep_text_fields=False))
+
+        base = {
+            field_name: value for field_name, value in neighbor.result.get("supported_fields", {}).items()
+            if field_name not in changed
+        }
+        narrowed = tuple(field_name for field_name in residual if field_name in changed)
+        logger.info(
+            "Reusing %d fields from a similar prompt (similarity %.2f); %d left for the model",
+            len(base), neighbor.similarity, len(narrowed),
+        )
+        return base, narrowed, list(neighbor.result.get("unsupported_fields", []))
+
+    def _remember(self, prompt: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Index the result so later variants of this prompt can start from it"""
+        if self.index is not None:
+            self.index.add(prompt, result)
+        return result
+
+    def _pre_extract(self, prompt: str) -> Tuple[Dict[str, Any], Tuple[str, ...]]:
+        """Run the rules and pick the fields left for the model (empty when fully covered)"""
+        with REGISTRY.span("ai", stage="rules"):
+            rule_result = self.rules.extract(prompt)
+            if rule_result["covered"]:
+                return rule_result["supported_fields"], ()
+
+            unresolved = tuple(rule_result["unresolved_fields"])
+            relevant = set(self.rules.relevant_fields(prompt))
+            residual = tuple(name for name in unresolved if name in relevant)
+            # Text fields are always kept, so only another field shows the slice found what the prompt is about
+            if not any(self.rules.fields[name]["type"] != "text" for name in residual):
+                return rule_result["supported_fields"], unresolved
+            dropped = [name for name in unresolved if name not in relevant]
+            if dropped:
+                logger.debug("Fields left out of the request as unrelated to the prompt: %s", ", ".join(dropped))
+            return rule_result["supported_fields"], residual
+
+    def _merge(self, fields: Dict[str, Any], model_result: Dict[str, Any]) -> Dict[str, Any]:
+        model_fields = model_result.get("supported_fields", {})
+        merged = {**model_fields, **fields}
+        for field_name, value in fields.items():
+            # The rules may have found only some of a multiselect's options
+            if isinstance(value, list) and isinstance(model_fields.get(field_name), list):
+                merged[field_name] = self._combine(field_name, value, model_fields[field_name])
+        return {"supported_fields": merged, "unsupported_fields": model_result.get("unsupported_fields", [])}
+
+    def _combine(self, field_name: str, rule_value: List[Any], model_value: List[Any]) -> List[Any]:
+        """Union of two multiselect values, in option order"""
+        options = self.rules.fields[field_name].get("options", [])
+        return [option for option in options if option in rule_value or option in model_value]
+
+    @property
+    def async_client(self) -> openai.AsyncOpenAI:
+        """Async client with the same settings, created on first use"""
+        if self._async_client is None:
+            self._async_client = openai.AsyncOpenAI(**self._client_options)
+        return self._async_client
+
+    async def aclose(self):
+        """Close the async client's connections; it is recreated if used again"""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+    def _cache_key(self, prompt: str, field_names: Tuple[str, ...], delta: bool = False) -> Optional[str]:
+        if self.cache is None:
+            return None
+        params = {**self.model_params, "output_mode": self.output_mode, "fields": list(field_names), "delta": delta}
+        if len(self.tiers) > 1:
+            params.update(tiers=list(self.tiers), min_confidence=self.min_confidence)
+        return make_cache_key(prompt, self.cache.schema_hash, params)
+
+    def _cache_get(self, cache_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if cache_key is None:
+            return None
+        cached = self.cache.get(cache_key)
+        REGISTRY.inc("ai_cache_lookups", result="miss" if cached is None else "hit")
+        return cached
+
+    async def _acomplete(self, prompt: str, field_names: Tuple[str, ...]) -> Dict[str, Any]:
+        cache_key = self._cache_key(prompt, field_names)
+        # The cache may read and write SQLite; keep that off the event loop
+        cached = await asyncio.to_thread(self._cache_get, cache_key)
+        if cached is not None:
+            return cached
+
+        with REGISTRY.span("ai", stage="prompt_build"):
+            system_prompt, request_options, _ = self._request_spec(field_names)
+            messages = self._messages(system_prompt, prompt)
+        self._log_prompt_tokens(field_names)
+        mentioned = self._mentioned_fields(prompt, field_names)
+        for tier, model in enumerate(self.tiers):
+            try:
+                with REGISTRY.span("ai_tier", model=model):
+                    with REGISTRY.span("ai", stage="network"):
+                        response = await self.async_client.chat.completions.create(
+                            messages=messages, **request_options, **{**self.model_params, "model": model}
+                        )
+                    REGISTRY.record_tokens(response.usage, model)
+                    with REGISTRY.span("ai", stage="parse"):
+                        result, repaired = parse_checked(self._reply_text(response.choices[0].message))
+                    with REGISTRY.span("ai", stage="validate"):
+                        result, rejected = self._validated(result)
+            except ESCALATION_ERRORS as e:
+                if not self._escalate_after_error(tier, model, e):
+                    raise
+                continue
+            if self._accept(tier, model, result, rejected, field_names, mentioned, repaired):
+                break
+
+        # A repaired reply (e.g. truncated) may be missing fields; the next run should ask again
+        if cache_key is not None and not repaired:
+            await asyncio.to_thread(self.cache.set, cache_key, result)
+        return result
+
+    def _complete(
+        self,
+        prompt: str,
+        field_names: Tuple[str, ...],
+        on_field: Optional[Callable[[str, Any], None]],
+        timeout: Optional[float] = None,
+        delta: bool = False,
+    ) -> Dict[str, Any]:
+        """Ask the model tiers for ``field_names``, going through the response cache"""
+        cache_key = self._cache_key(prompt, field_names, delta)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        with REGISTRY.span("ai", stage="prompt_build"):
+            system_prompt, request_options, _ = self._request_spec(field_names, delta)
+            messages = self._messages(system_prompt, prompt)
+        self._log_prompt_tokens(field_names, delta)
+        # A follow-up only returns what changes, so it is not expected to cover what it mentions
+        mentioned = () if delta else self._mentioned_fields(prompt, field_names)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for tier, model in enumerate(self.tiers):
+            client = self.client
+            if deadline is not None:
+                client = client.with_options(timeout=max(deadline - time.monotonic(), 0.001))
+            tier_on_field, buffered = on_field, []
+            if on_field is not None and tier < len(self.tiers) - 1:
+                # Fields of a reply that may still be escalated are held back until it is accepted
+                tier_on_field = lambda field_name, value: buffered.append((field_name, value))
+            try:
+                with REGISTRY.span("ai_tier", model=model):
+                    result, repaired = self._request(client, messages, request_options, model, tier_on_field)
+                    with REGISTRY.span("ai", stage="validate"):
+                        result, rejected = self._validated(result)
+            except ESCALATION_ERRORS as e:
+                if not self._escalate_after_error(tier, model, e):
+                    raise
+                continue
+            if self._accept(tier, model, result, rejected, field_names, mentioned, repaired):
+                for field_name, value in buffered:
+                    on_field(field_name, value)
+                break
+
+        if cache_key is not None and not repaired:
+            self.cache.set(cache_key, result)
+        return result
+
+    def _request(
+        self,
+        client: openai.OpenAI,
+        messages,
+        request_options: Dict[str, Any],
+        model: str,
+        on_field: Optional[Callable[[str, Any], None]],
+    ) -> Tuple[Dict[str, Any], bool]:
+        """One completion on ``model``: the parsed reply and whether it had to be repaired"""
+        if on_field:
+            return self._request_stream(client, messages, request_options, model, on_field)
+        with REGISTRY.span("ai", stage="network"):
+            response = client.chat.completions.create(
+                messages=messages, **request_options, **{**self.model_params, "model": model}
+            )
+        REGISTRY.record_tokens(response.usage, model)
+        with REGISTRY.span("ai", stage="parse"):
+            return parse_checked(self._reply_text(response.choices[0].message))
+
+    def _request_stream(
+        self,
+        client: openai.OpenAI,
+        messages,
+        request_options: Dict[str, Any],
+        model: str,
+        on_field: Callable[[str, Any], None],
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Stream the completion, reporting each parsed field.
+
+        If the finished reply cannot be parsed or repaired, the fields
+        already parsed from the stream are kept. The network span covers the
+        whole stream, including the incremental parsing of each chunk.
+        """
+        parser = SupportedFieldsParser()
+        with REGISTRY.span("ai", stage="network"):
+            stream = client.chat.completions.create(
+                messages=messages,
+                stream=True,
+                # Ask for a final usage chunk; sent as extra body for older SDKs
+                extra_body={"stream_options": {"include_usage": True}},
+                **request_options,
+                **{**self.model_params, "model": model},
+            )
+            for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    REGISTRY.record_tokens(chunk.usage, model)
+                if not chunk.choices:
+                    continue
+                delta = self._reply_text(chunk.choices[0].delta)
+                if not delta:
+                    continue
+                for field_name, value in parser.feed(delta).items():
+                    on_field(field_name, value)
+
+        with REGISTRY.span("ai", stage="parse"):
+            try:
+                return parse_checked(parser.text)
+            except ValueError:
+                if not parser.fields:
+                    raise
+                return {"supported_fields": dict(parser.fields), "unsupported_fields": []}, True
+
+    def _mentioned_fields(self, prompt: str, field_names: Tuple[str, ...]) -> List[str]:
+        """Requested fields the prompt names outright, which a good reply should fill"""
+        if len(self.tiers) == 1:
+            return []
+        requested = set(field_names)
+        return [
+            name for name in self.rules.relevant_fields(prompt, keep_text_fields=False, match_values=False)
+            if name in requested
+        ]
+
+    def _accept(
+        self,
+        tier: int,
+        model: str,
+        result: Dict[str, Any],
+        rejected: List[str],
+        field_names: Tuple[str, ...],
+        mentioned: List[str],
+        repaired: bool,
+    ) -> bool:
+        """Whether a tier's result is final; records the escalation rate per model"""
+        if tier == len(self.tiers) - 1:
+            REGISTRY.inc("ai_tier_results", model=model, outcome="accepted")
+            return True
+        assessment = assess_result(result, rejected, field_names, mentioned, repaired)
+        if assessment.confidence >= self.min_confidence:
+            REGISTRY.inc("ai_tier_results", model=model, outcome="accepted")
+            return True
+        REGISTRY.inc("ai_tier_results", model=model, outcome="escalated")
+        for reason in assessment.reasons:
+            REGISTRY.inc("ai_escalations", model=model, reason=reason)
+        logger.info(
+            "Escalating from %s: confidence %.2f (%s)", model, assessment.confidence, ", ".join(assessment.reasons)
+        )
+        return False
+
+    def _escalate_after_error(self, tier: int, model: str, error: Exception) -> bool:
+        """Whether a failed tier can hand the request to the next one"""
+        if tier == len(self.tiers) - 1:
+            return False
+        REGISTRY.inc("ai_tier_results", model=model, outcome="escalated")
+        REGISTRY.inc("ai_escalations", model=model, reason="error")
+        logger.info("Escalating from %s after error: %s", model, error)
+        return True
+
+    def _reply_text(self, message) -> Optional[str]:
+        """Reply text of a message or stream delta (the tool call arguments in "tools" mode)"""
+        if self.output_mode != "tools":
+            return message.content
+        if not message.tool_calls:
+            # Models may still answer in plain text; the parser and repair step handle it
+            return message.content
+        return message.tool_calls[0].function.arguments
+
+    def _validated(self, result: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+        """Keep only values that match their field's type, options and bounds; also return the rejected fields"""
+        supported_fields = result.get("supported_fields")
+        valid, rejected = validate_fields(
+            self.rules.fields, supported_fields if isinstance(supported_fields, dict) else {}
+        )
+        if rejected:
+            logger.info("Dropped invalid values for fields: %s", ", ".join(rejected))
+        unsupported_fields = result.get("unsupported_fields")
+        return {
+            "supported_fields": valid,
+            "unsupported_fields": [str(name) for name in unsupported_fields]
+            if isinstance(unsupported_fields, list) else [],
+        }, rejected
+
+    @staticmethod
+    def _messages(system_prompt: str, prompt: str):
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _request_spec(self, field_names: Tuple[str, ...], delta: bool = False) -> Tuple[str, Dict[str, Any], int]:
+        """System prompt, output constraint options and prompt token count for a field subset"""
+        spec_key = (field_names, delta)
+        if spec_key not in self._request_specs:
+            if len(self._request_specs) >= 256:
+                self._request_specs.clear()
+            schemas = self.field_schemas if field_names == self._all_fields else select_fields(
+                self.field_schemas, field_names
+            )
+            system_prompt = build_system_prompt(schemas, output_mode=self.output_mode, delta=delta)
+
+            request_options: Dict[str, Any] = {}
+            if self.output_mode == "tools":
+                request_options = {
+                    "tools": [{
+                        "type": "function",
+                        "function": {
+                            "name": FORM_TOOL_NAME,
+                            "description": "Fill the credit card program form",
+                            "parameters": build_json_schema(schemas),
+                        },
+                    }],
+                    "tool_choice": {"type": "function", "function": {"name": FORM_TOOL_NAME}},
+                }
+            elif self.output_mode == "json_schema":
+                request_options = {
+                    "response_format": {
+                        "type": "json_schema",
+                        "json_schema": {"name": "program_fields", "schema": build_json_schema(schemas)},
+                    }
+                }
+
+            tokens = count_tokens(
+                system_prompt + json.dumps(request_options, separators=(",", ":")), self.model_params["model"]
+            )
+            self._request_specs[spec_key] = (system_prompt, request_options, tokens)
+        return self._request_specs[spec_key]
+
+    def _log_prompt_tokens(self, field_names: Tuple[str, ...], delta: bool = False) -> None:
+        logger.info(
+            "Prompt tokens (%s): full=%d request=%d sliced=%d (%d of %d fields%s)",
+            self.output_mode, self.prompt_tokens["full"], self.prompt_tokens["request"],
+            self._request_spec(field_names, delta)[2], len(field_names), len(self._all_fields),
+            ", follow-up" if delta else "",
+        )
@@ -0,0 +1,129 @@
+"""Per-field coercers compiled once from the field schemas"""
+
+from datetime import date, datetime, time
+from typing import Any, Callable, Dict, List, Optional
+
+NUMERIC_TYPES = (int, float)
+
+
+class CompiledField:
+    """A field definition with everything the render path needs precomputed.
+
+    ``coerce`` turns a raw value (AI output, JSON, widget state) into the
+    typed value the widget expects, or None when it cannot be used. It is
+    meant to run once, when a value arrives, so rendering only has to read
+    ``option_index`` and the already-typed value.
+    """
+
+    __slots__ = (
+        "name", "info", "type", "label", "options", "option_index",
+        "min", "max", "step", "use_float", "coerce",
+    )
+
+    def __init__(self, name: str, info: Dict[str, Any]):
+        self.name = name
+        self.info = info
+        self.type = info["type"]
+        self.label = info["label"]
+        self.options: List[str] = list(info.get("options", []))
+        self.option_index = {option: index for index, option in enumerate(self.options)}
+
+        # Slider bounds share one numeric type so st.slider accepts them
+        min_val, max_val, step = info.get("min", 0), info.get("max", 100), info.get("step", 1)
+        self.use_float = any(isinstance(bound, float) for bound in (min_val, max_val, step))
+        cast = float if self.use_float else int
+        self.min, self.max, self.step = cast(min_val), cast(max_val), cast(step)
+
+        self.coerce: Callable[[Any], Any] = getattr(self, f"_coerce_{self.type}", self._coerce_text)
+
+    def _coerce_text(self, value: Any) -> Optional[str]:
+        return None if value is None else str(value)
+
+    _coerce_textarea = _coerce_text
+
+    def _coerce_number(self, value: Any) -> Optional[Any]:
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, NUMERIC_TYPES):
+            return value
+        try:
+            number = float(str(value).replace("$", "").replace(",", "").strip())
+        except (TypeError, ValueError):
+            return None
+        return int(number) if number.is_integer() else number
+
+    def _coerce_checkbox(self, value: Any) -> Optional[bool]:
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in ("true", "yes", "1"):
+            return True
+        if text in ("false", "no", "0"):
+            return False
+        return None
+
+    def _coerce_date(self, value: Any) -> Optional[date]:
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        try:
+            return datetime.strptime(str(value), "%Y-%m-%d").date()
+        except ValueError:
+            return None
+
+    def _coerce_time(self, value: Any) -> Optional[time]:
+        if isinstance(value, time):
+            return value
+        text = str(value)
+        try:
+            return datetime.strptime(text, "%H:%M:%S" if text.count(":") == 2 else "%H:%M").time()
+        except ValueError:
+            return None
+
+    def _coerce_select(self, value: Any) -> Optional[str]:
+        return value if value in self.option_index else None
+
+    _coerce_radio = _coerce_select
+
+    def _coerce_multiselect(self, value: Any) -> List[str]:
+        values = value if isinstance(value, (list, tuple)) else [value]
+        return [option for option in values if option in self.option_index]
+
+    def _coerce_slider(self, value: Any) -> Optional[Any]:
+        # A two-element list is a range; a one-element list is a single value
+        if isinstance(value, (list, tuple)):
+            if len(value) > 1:
+                bounds = [self._clamp(item) for item in value[:2]]
+                return None if None in bounds else tuple(bounds)
+            value = value[0] if value else None
+        return self._clamp(value)
+
+    def _clamp(self, value: Any) -> Optional[Any]:
+        number = self._coerce_number(value)
+        if number is None:
+            return None
+        number = float(number) if self.use_float else int(number)
+        return max(self.min, min(self.max, number))
+
+
+def compile_fields(field_schemas: Dict[str, Dict]) -> Dict[str, CompiledField]:
+    """Compile every field of every page, keyed by field name"""
+    return {
+        field_name: CompiledField(field_name, field_info)
+        for page_fields in field_schemas.values()
+        for field_name, field_info in page_fields.items()
+    }
+
+
+def coerce_fields(compiled_fields: Dict[str, CompiledField], values: Dict[str, Any]) -> Dict[str, Any]:
+    """Coerce a batch of raw values, dropping unknown fields and unusable values"""
+    coerced = {}
+    for field_name, value in values.items():
+        field = compiled_fields.get(field_name)
+        if field is None:
+            continue
+        typed = field.coerce(value)
+        if typed is not None:
+            coerced[field_name] = typed
+    return coerced
@@ -0,0 +1,37 @@
+"""Field definitions for every page of the program setup form, loaded from the default schema file"""
+
+import functools
+import os
+
+from form_schema import FormSchema, load_schema
+
+# Set FORM_SCHEMA_PATH to use another JSON/YAML schema file
+DEFAULT_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schemas", "credit_card_program.json")
+SCHEMA_PATH = os.getenv("FORM_SCHEMA_PATH") or DEFAULT_SCHEMA_PATH
+
+# The attributes below are computed from the schema file on first access,
+# so importing SCHEMA_PATH alone (as the app does) does not parse it:
+#   FORM_SCHEMA    the compiled schema; the app follows later edits through form_schema.SchemaSource
+#   FIELD_SCHEMAS  page → field → definition
+#   ALL_FIELDS     flat lookup of every field across all pages
+#   SCHEMA_HASH    changes whenever a field or option changes; keys caches and compiled artifacts
+_SCHEMA_ATTRIBUTES = {
+    "FORM_SCHEMA": lambda schema: schema,
+    "FIELD_SCHEMAS": lambda schema: schema.field_schemas,
+    "ALL_FIELDS": lambda schema: schema.fields,
+    "SCHEMA_HASH": lambda schema: schema.hash,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def default_schema() -> FormSchema:
+    """The schema at SCHEMA_PATH, loaded once per process"""
+    return load_schema(SCHEMA_PATH)
+
+
+def __getattr__(name: str):
+    if name in _SCHEMA_ATTRIBUTES:
+        value = _SCHEMA_ATTRIBUTES[name](default_schema())
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
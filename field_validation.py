@@ -0,0 +1,80 @@
+"""Validation of extracted field values against the field schemas"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+
+def _to_number(value: Any) -> Any:
+    if isinstance(value, bool):
+        raise ValueError("boolean is not a number")
+    if isinstance(value, (int, float)):
+        return value
+    number = float(str(value).replace("$", "").replace(",", "").replace("%", "").strip())
+    return int(number) if number.is_integer() else number
+
+
+def validate_value(field_info: Dict, value: Any) -> Any:
+    """Return ``value`` in the form the field expects, or raise ValueError"""
+    field_type = field_info["type"]
+
+    if field_type in ("text", "textarea"):
+        if isinstance(value, (dict, list)):
+            raise ValueError("expected a string")
+        return str(value)
+
+    if field_type == "number":
+        return _to_number(value)
+
+    if field_type == "slider":
+        if isinstance(value, list) and value:
+            value = value[0]
+        number = _to_number(value)
+        if not field_info.get("min", 0) <= number <= field_info.get("max", 100):
+            raise ValueError(f"{number} is outside {field_info.get('min', 0)}-{field_info.get('max', 100)}")
+        return number
+
+    if field_type == "checkbox":
+        if isinstance(value, bool):
+            return value
+        if str(value).strip().lower() in ("true", "yes", "1"):
+            return True
+        if str(value).strip().lower() in ("false", "no", "0"):
+            return False
+        raise ValueError("expected true/false")
+
+    if field_type == "date":
+        return datetime.strptime(str(value), "%Y-%m-%d").date().isoformat()
+
+    if field_type == "time":
+        text = str(value)
+        parsed = datetime.strptime(text, "%H:%M:%S" if text.count(":") == 2 else "%H:%M")
+        return parsed.time().isoformat()
+
+    if field_type in ("select", "radio"):
+        if value not in field_info["options"]:
+            raise ValueError(f"{value!r} is not one of the options")
+        return value
+
+    if field_type == "multiselect":
+        values = value if isinstance(value, list) else [value]
+        selected = [option for option in values if option in field_info["options"]]
+        if not selected:
+            raise ValueError("none of the values are options")
+        return selected
+
+    return value
+
+
+def validate_fields(all_fields: Dict[str, Dict], fields: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """Split extracted fields into valid, normalized values and rejected field names"""
+    valid = {}
+    rejected = []
+    for field_name, value in fields.items():
+        if field_name not in all_fields or value is None:
+            rejected.append(field_name)
+            continue
+        try:
+            valid[field_name] = validate_value(all_fields[field_name], value)
+        except (TypeError, ValueError):
+            rejected.append(field_name)
+    return valid, rejected
@@ -0,0 +1,247 @@
+"""Declarative form schema: loaded from JSON/YAML, compiled into indexed pages, hot-reloaded on change"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    import yaml
+except ImportError:  # optional; only needed for .yaml/.yml schema files
+    yaml = None
+
+from field_coercion import CompiledField, compile_fields
+from response_cache import schema_fingerprint
+
+logger = logging.getLogger(__name__)
+
+FIELD_TYPES = ("text", "number", "date", "time", "select", "multiselect", "checkbox", "radio", "textarea", "slider")
+OPTION_TYPES = ("select", "multiselect", "radio")
+
+# Keys of a field entry that describe layout rather than the field itself
+LAYOUT_KEYS = ("name", "column")
+
+
+class SchemaError(ValueError):
+    """The schema file is missing, unreadable or inconsistent"""
+
+
+class PageSpec(NamedTuple):
+    key: str
+    title: str
+    nav_title: str
+    icon: str
+    subheader: Optional[str]
+    ai_section: bool
+    # Field names per column, in display order
+    columns: Tuple[Tuple[str, ...], ...]
+
+
+class FormSchema:
+    """A loaded schema with the lookups the app needs precomputed.
+
+    ``field_schemas`` is the page → field → definition mapping the
+    extractor, validation and coercion work on; ``pages`` holds the layout
+    of each page, ``field_page`` the page of every field and ``compiled``
+    the per-field coercers and option indexes. ``hash`` only covers the
+    field definitions, so a layout change keeps caches valid.
+    """
+
+    def __init__(self, pages: List[PageSpec], field_schemas: Dict[str, Dict[str, Dict[str, Any]]], source: str = ""):
+        self.pages = pages
+        self.field_schemas = field_schemas
+        self.source = source
+        self.page_index = {page.key: index for index, page in enumerate(pages)}
+        self.fields = {
+            field_name: field_info
+            for page_fields in field_schemas.values()
+            for field_name, field_info in page_fields.items()
+        }
+        self.field_page = {
+            field_name: page_key
+            for page_key, page_fields in field_schemas.items()
+            for field_name in page_fields
+        }
+        self.compiled: Dict[str, CompiledField] = compile_fields(field_schemas)
+        self.hash = schema_fingerprint(field_schemas)
+        # Also changes with the layout
+        self.version = schema_fingerprint({"hash": self.hash, "pages": [page._asdict() for page in pages]})
+
+    def page(self, key: str) -> PageSpec:
+        return self.pages[self.page_index[key]]
+
+    def changed_fields(self, other: "FormSchema") -> List[str]:
+        """Fields whose definition differs from (or is missing in) ``other``"""
+        return [name for name, info in self.fields.items() if other.fields.get(name) != info]
+
+
+def parse_schema(data: Any, source: str = "") -> FormSchema:
+    """Check a decoded schema document and compile it"""
+    if not isinstance(data, dict) or not isinstance(data.get("pages"), list) or not data["pages"]:
+        raise SchemaError(f"{source}: expected an object with a non-empty \"pages\" list")
+
+    pages: List[PageSpec] = []
+    field_schemas: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    seen_fields = set()
+    for page_number, page in enumerate(data["pages"], start=1):
+        if not isinstance(page, dict):
+            raise SchemaError(f"{source}: page {page_number} is not an object")
+        key = page.get("key") or f"page_{page_number}"
+        if key in field_schemas:
+            raise SchemaError(f"{source}: duplicate page key {key!r}")
+        fields = page.get("fields") or []
+        if not isinstance(fields, list):
+            raise SchemaError(f"{source}: page {key!r} has no \"fields\" list")
+        column_count = page.get("columns", 2)
+        if not _is_positive_int(column_count):
+            raise SchemaError(f"{source}: page {key!r} \"columns\" must be a positive integer")
+
+        page_fields: Dict[str, Dict[str, Any]] = {}
+        placed: List[Tuple[Optional[int], str]] = []
+        for field in fields:
+            if not isinstance(field, dict):
+                raise SchemaError(f"{source}: page {key!r} has a field that is not an object")
+            name = field.get("name")
+            if not name or name in seen_fields:
+                raise SchemaError(f"{source}: page {key!r} has a field without a name or a duplicate name {name!r}")
+            info = {k: v for k, v in field.items() if k not in LAYOUT_KEYS}
+            _check_field(info, f"{source}: field {name!r}")
+            if field.get("column") is not None and not _is_positive_int(field["column"]):
+                raise SchemaError(f"{source}: field {name!r} \"column\" must be a positive integer")
+            seen_fields.add(name)
+            page_fields[name] = info
+            placed.append((field.get("column"), name))
+
+        field_schemas[key] = page_fields
+        title = page.get("title", key)
+        pages.append(PageSpec(
+            key=key,
+            title=title,
+            nav_title=page.get("nav_title", title),
+            icon=page.get("icon", ""),
+            subheader=page.get("subheader"),
+            ai_section=bool(page.get("ai_section", False)),
+            columns=_layout_columns(placed, column_count),
+        ))
+    return FormSchema(pages, field_schemas, source)
+
+
+def _is_positive_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 1
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _check_field(info: Dict[str, Any], where: str):
+    field_type = info.get("type")
+    if field_type not in FIELD_TYPES:
+        raise SchemaError(f"{where}: unknown type {field_type!r}")
+    if not info.get("label") or not isinstance(info["label"], str):
+        raise SchemaError(f"{where}: missing label")
+    if field_type in OPTION_TYPES and not info.get("options"):
+        raise SchemaError(f"{where}: {field_type} fields need options")
+    options = info.get("options", [])
+    # A bare string would be compiled as a list of its characters
+    if not isinstance(options, list) or not all(isinstance(option, str) for option in options):
+        raise SchemaError(f"{where}: options must be a list of strings")
+    for bound in ("min", "max", "step"):
+        if bound in info and not _is_number(info[bound]):
+            raise SchemaError(f"{where}: {bound} must be a number")
+    if field_type == "slider" and info.get("min", 0) > info.get("max", 100):
+        raise SchemaError(f"{where}: min is above max")
+
+
+def _layout_columns(placed: List[Tuple[Optional[int], str]], column_count: int) -> Tuple[Tuple[str, ...], ...]:
+    """Fields with an explicit 1-based ``column`` go there; the rest fill the columns top to bottom in order"""
+    columns: List[List[str]] = [[] for _ in range(column_count)]
+    unplaced = [name for column, name in placed if not column]
+    per_column = math.ceil(len(unplaced) / column_count) if unplaced else 0
+    for index, name in enumerate(unplaced):
+        columns[index // per_column].append(name)
+    for column, name in placed:
+        if column:
+            columns[min(column, column_count) - 1].append(name)
+    return tuple(tuple(column) for column in columns)
+
+
+def load_schema(path: str) -> FormSchema:
+    """Read and compile a JSON or YAML schema file"""
+    is_yaml = path.endswith((".yaml", ".yml"))
+    if is_yaml and yaml is None:
+        raise SchemaError(f"{path}: install PyYAML to load YAML schemas")
+    try:
+        with open(path, encoding="utf-8") as handle:
+            data = yaml.safe_load(handle) if is_yaml else json.load(handle)
+    except (OSError, ValueError) as e:
+        raise SchemaError(f"{path}: {e}") from e
+    except Exception as e:
+        if yaml is not None and isinstance(e, yaml.YAMLError):
+            raise SchemaError(f"{path}: {e}") from e
+        raise
+    return parse_schema(data, path)
+
+
+class SchemaSource:
+    """The current schema of a file, reloaded when its modification time changes.
+
+    ``current`` checks the file at most every ``check_interval_s`` seconds,
+    so calling it on every script run costs a clock read most of the time
+    and a ``stat`` otherwise. A file that fails to load keeps the previous
+    schema in place (the error is logged and kept in ``last_error``).
+    The last few versions stay available through ``version`` so sessions
+    can work out which fields changed since the schema they last used.
+    """
+
+    def __init__(self, path: str, check_interval_s: float = 1.0, keep_versions: int = 8):
+        self.path = path
+        self.check_interval_s = check_interval_s
+        self.keep_versions = keep_versions
+        self.last_error: Optional[str] = None
+        self._mtime = os.stat(path).st_mtime_ns
+        self._schema = load_schema(path)
+        self._versions: Dict[str, FormSchema] = {self._schema.version: self._schema}
+        self._checked_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def current(self) -> FormSchema:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval_s:
+            return self._schema
+        with self._lock:
+            if now - self._checked_at >= self.check_interval_s:
+                self._checked_at = now
+                self._reload_if_changed()
+        return self._schema
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            self.last_error = str(e)
+            return
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        try:
+            schema = load_schema(self.path)
+        # SchemaError is a ValueError; anything the checks missed must not break the running app either
+        except (ValueError, TypeError) as e:
+            self.last_error = str(e)
+            logger.warning("Keeping the previous form schema: %s", e)
+            return
+        self.last_error = None
+        if schema.version != self._schema.version:
+            logger.info("Reloaded form schema from %s (%d fields)", self.path, len(schema.fields))
+        self._schema = schema
+        self._versions[schema.version] = schema
+        while len(self._versions) > self.keep_versions:
+            del self._versions[next(iter(self._versions))]
+
+    def version(self, version: str) -> Optional[FormSchema]:
+        """An earlier schema by its ``FormSchema.version``, if still kept"""
+        return self._versions.get(version)
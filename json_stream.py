@@ -0,0 +1,92 @@
+"""Incremental parsing of the model's JSON reply while it is still streaming"""
+
+import json
+from typing import Any, Dict, List
+
+
+class SupportedFieldsParser:
+    """Reports each member of ``supported_fields`` as soon as it is complete.
+
+    Feed the reply text chunk by chunk; the parser tracks string/escape state
+    and container depth, so a member is emitted once the ``,`` or ``}`` that
+    ends it arrives, without waiting for the rest of the document.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key = None
+        self._top_key = None
+        self._in_supported = False
+        self._member_start = 0
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        return self._text
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        """Consume a chunk and return the fields completed by it"""
+        self._text += chunk
+        completed = {}
+        text = self._text
+
+        for i in range(self._pos, len(text)):
+            char = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_key = text[self._string_start:i + 1]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == ":" and len(self._stack) == 1 and self._last_key is not None:
+                try:
+                    self._top_key = json.loads(self._last_key)
+                except ValueError:
+                    self._top_key = None
+            elif char in "{[":
+                self._stack.append(char)
+                if len(self._stack) == 2 and char == "{" and self._top_key == "supported_fields":
+                    self._in_supported = True
+                    self._member_start = i + 1
+            elif char in "}]":
+                if self._in_supported and len(self._stack) == 2:
+                    completed.update(self._parse_member(text[self._member_start:i]))
+                    self._in_supported = False
+                if self._stack:
+                    self._stack.pop()
+                if len(self._stack) <= 1:
+                    self._last_key = None
+            elif char == ",":
+                if self._in_supported and len(self._stack) == 2:
+                    completed.update(self._parse_member(text[self._member_start:i]))
+                    self._member_start = i + 1
+                elif len(self._stack) == 1:
+                    self._last_key = None
+
+        self._pos = len(text)
+        self.fields.update(completed)
+        return completed
+
+    @staticmethod
+    def _parse_member(member: str) -> Dict[str, Any]:
+        if not member.strip():
+            return {}
+        try:
+            return json.loads("{" + member + "}")
+        except ValueError:
+            return {}
@@ -0,0 +1,248 @@
+"""In-process timing spans, histograms and counters, with Prometheus and JSON-lines export"""
+
+import bisect
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans range from sub-millisecond renders to multi-second model calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Where the current session collects its recent spans; background jobs copy the context
+_recent: contextvars.ContextVar[Optional[Deque[Dict[str, Any]]]] = contextvars.ContextVar("recent_spans", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile (None when empty)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class MetricsRegistry:
+    """Thread-safe store of span histograms and counters, shared by the whole process"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextmanager
+    def span(self, name: str, recent: bool = True, **labels: str) -> Iterator[None]:
+        """Time the block into the ``name`` histogram.
+
+        With ``recent`` the span is also appended to the current session's
+        recent spans (see ``bind_recent``); per-field spans turn it off so
+        they do not crowd out everything else.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe(name, elapsed, **labels)
+            sink = _recent.get() if recent else None
+            if sink is not None:
+                sink.append({"span": name, **labels, "ms": round(elapsed * 1000, 3), "at": time.time()})
+
+    def timed(self, name: str, recent: bool = True, **labels: str):
+        """Decorator form of ``span``"""
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(name, recent, **labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def record_tokens(self, usage: Any, model: str):
+        """Count the token usage reported with a completion"""
+        if usage is None:
+            return
+        for kind in ("prompt", "completion"):
+            tokens = getattr(usage, f"{kind}_tokens", None)
+            if tokens:
+                self.inc("openai_tokens", tokens, type=kind, model=model)
+                sink = _recent.get()
+                if sink is not None:
+                    sink.append({"span": f"{kind}_tokens", "tokens": tokens, "at": time.time()})
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """One row per histogram: count, mean and bucketed p50/p95, in milliseconds"""
+        with self._lock:
+            rows = []
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                p50, p95 = histogram.quantile(0.5), histogram.quantile(0.95)
+                rows.append({
+                    "span": name,
+                    **dict(labels),
+                    "count": histogram.count,
+                    "mean_ms": round(histogram.sum / histogram.count * 1000, 3),
+                    "p50_ms": None if p50 is None else p50 * 1000,
+                    "p95_ms": None if p95 is None else p95 * 1000,
+                })
+            return rows
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-friendly copy of every histogram and counter"""
+        with self._lock:
+            return {
+                "ts": time.time(),
+                "histograms": [
+                    {
+                        "name": name,
+                        "labels": dict(labels),
+                        "buckets": list(histogram.buckets),
+                        "counts": list(histogram.counts),
+                        "sum": histogram.sum,
+                        "count": histogram.count,
+                    }
+                    for (name, labels), histogram in self._histograms.items()
+                ],
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self._counters.items()
+                ],
+            }
+
+    def prometheus_text(self, prefix: str = "ccps_") -> str:
+        """Everything in the Prometheus text exposition format"""
+        lines: List[str] = []
+        with self._lock:
+            by_name: Dict[str, List[Tuple[Labels, Histogram]]] = {}
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                by_name.setdefault(name, []).append((labels, histogram))
+            for name, series in by_name.items():
+                metric = f"{prefix}{name}_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, histogram in series:
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{metric}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+
+            counter_names = sorted({name for name, _ in self._counters})
+            for name in counter_names:
+                metric = f"{prefix}{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (counter_name, labels), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{metric}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def bind_recent(sink: Optional[Deque[Dict[str, Any]]]) -> contextvars.Token:
+    """Collect spans of the current context (and jobs started from it) into ``sink``"""
+    return _recent.set(sink)
+
+
+def new_recent(maxlen: int = 50) -> Deque[Dict[str, Any]]:
+    return deque(maxlen=maxlen)
+
+
+def start_http_exporter(registry: MetricsRegistry, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve ``/metrics`` (Prometheus text) and ``/metrics.json`` from a daemon thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = registry.prometheus_text().encode(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, content_type = json.dumps(registry.snapshot()).encode(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+    return server
+
+
+def start_file_exporter(registry: MetricsRegistry, path: str, interval_s: float = 60.0) -> threading.Thread:
+    """Append a JSON-lines snapshot of the registry to ``path`` every ``interval_s`` seconds"""
+
+    def run():
+        while True:
+            time.sleep(interval_s)
+            try:
+                with open(path, "a", encoding="utf-8") as handle:
+                    handle.write(json.dumps(registry.snapshot()) + "\n")
+            except OSError as e:
+                logger.warning("Could not write metrics to %s: %s", path, e)
+
+    thread = threading.Thread(target=run, name="metrics-file", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,78 @@
+"""Confidence of a model reply, used to decide when a cheap model's answer needs a larger model"""
+
+import json
+from typing import Any, Collection, Dict, List, NamedTuple, Optional, Tuple
+
+from structured_output import parse_reply
+
+# Confidence is multiplied by this when the reply was not valid JSON and had to be repaired
+REPAIRED_FACTOR = 0.75
+
+
+class Assessment(NamedTuple):
+    confidence: float
+    # Why confidence is below 1: "invalid", "missing", "repaired"
+    reasons: Tuple[str, ...]
+
+
+def parse_checked(text: Optional[str]) -> Tuple[Dict[str, Any], bool]:
+    """Parse a reply like ``parse_reply`` and also report whether it needed repair"""
+    text = text or ""
+    try:
+        value = json.loads(text)
+        if isinstance(value, dict):
+            return value, False
+    except (TypeError, ValueError):
+        pass
+    return parse_reply(text), True
+
+
+def assess_result(
+    result: Dict[str, Any],
+    rejected: List[str],
+    requested: Collection[str],
+    mentioned: Collection[str],
+    repaired: bool,
+) -> Assessment:
+    """Score a validated reply between 0 and 1.
+
+    The score is the share of returned values that passed validation
+    (``rejected`` lists the ones that did not), times the share of the
+    requested fields the prompt clearly mentions that came back, times
+    ``REPAIRED_FACTOR`` if the reply had to be repaired.
+    """
+    returned = result.get("supported_fields", {})
+    reasons = []
+
+    confidence = 1.0
+    if rejected:
+        confidence *= len(returned) / (len(returned) + len(rejected))
+        reasons.append("invalid")
+
+    expected = set(mentioned) & set(requested)
+    if expected:
+        found = len(expected & returned.keys())
+        if found < len(expected):
+            confidence *= found / len(expected)
+            reasons.append("missing")
+
+    if repaired:
+        confidence *= REPAIRED_FACTOR
+        reasons.append("repaired")
+    return Assessment(round(confidence, 3), tuple(reasons))
+
+
+def tier_report(registry) -> Dict[str, Dict[str, Any]]:
+    """Per model: accepted and escalated replies, escalation rate and latency from a ``MetricsRegistry``"""
+    report: Dict[str, Dict[str, Any]] = {}
+    for counter in registry.snapshot()["counters"]:
+        if counter["name"] == "ai_tier_results":
+            row = report.setdefault(counter["labels"]["model"], {"accepted": 0, "escalated": 0})
+            row[counter["labels"]["outcome"]] += int(counter["value"])
+    for row in registry.summary():
+        if row["span"] == "ai_tier" and row["model"] in report:
+            report[row["model"]].update(mean_ms=row["mean_ms"], p95_ms=row["p95_ms"])
+    for row in report.values():
+        total = row["accepted"] + row["escalated"]
+        row["escalation_rate"] = round(row["escalated"] / total, 3) if total else 0.0
+    return report
@@ -0,0 +1,128 @@
+"""Local similarity index over processed prompts (hashed character n-gram TF-IDF in NumPy)"""
+
+import copy
+import threading
+import zlib
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from response_cache import normalize_prompt
+
+
+class Neighbor(NamedTuple):
+    prompt: str
+    result: Dict[str, Any]
+    similarity: float
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int]) -> List[str]:
+    """Character n-grams of the lower-cased text, padded so word edges count"""
+    text = f" {normalize_prompt(text).lower()} "
+    low, high = ngram_range
+    return [text[i:i + n] for n in range(low, high + 1) for i in range(len(text) - n + 1)]
+
+
+class PromptIndex:
+    """Nearest-neighbour lookup of earlier prompts and their extraction results.
+
+    Prompts are embedded as sublinear TF vectors of hashed character
+    n-grams and compared by cosine similarity with IDF weights from the
+    indexed prompts. Vectors live in one preallocated float32 matrix; when
+    it is full the oldest entry is replaced. Everything is in memory and
+    shared by all sessions of the process.
+    """
+
+    def __init__(
+        self,
+        schema_hash: str,
+        dimensions: int = 4096,
+        ngram_range: Tuple[int, int] = (3, 5),
+        max_entries: int = 1000,
+        min_similarity: float = 0.75,
+    ):
+        self.schema_hash = schema_hash
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+        self.max_entries = max_entries
+        self.min_similarity = min_similarity
+
+        self._tf = np.zeros((max_entries, dimensions), dtype=np.float32)
+        self._df = np.zeros(dimensions, dtype=np.float32)
+        self._entries: List[Optional[Tuple[str, Dict[str, Any]]]] = [None] * max_entries
+        self._slots: Dict[str, int] = {}
+        self._next_slot = 0
+        self._count = 0
+        self._weighted: Optional[np.ndarray] = None
+        self._idf: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def vectorize(self, text: str) -> np.ndarray:
+        """Sublinear term frequencies of the hashed n-grams"""
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for gram in char_ngrams(text, self.ngram_range):
+            vector[zlib.crc32(gram.encode("utf-8")) % self.dimensions] += 1
+        nonzero = vector > 0
+        vector[nonzero] = 1 + np.log(vector[nonzero])
+        return vector
+
+    def add(self, prompt: str, result: Dict[str, Any]):
+        """Index a prompt with its result; re-adding a prompt replaces its result"""
+        key = normalize_prompt(prompt)
+        vector = self.vectorize(prompt)
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._next_slot
+                self._next_slot = (slot + 1) % self.max_entries
+                evicted = self._entries[slot]
+                if evicted is not None:
+                    del self._slots[normalize_prompt(evicted[0])]
+                    self._df -= self._tf[slot] > 0
+                else:
+                    self._count += 1
+                self._df += vector > 0
+                self._tf[slot] = vector
+                self._slots[key] = slot
+            self._entries[slot] = (prompt, copy.deepcopy(result))
+            self._weighted = None
+
+    def nearest(self, prompt: str) -> Optional[Neighbor]:
+        """Most similar indexed prompt at or above ``min_similarity``, if any"""
+        query = self.vectorize(prompt)
+        with self._lock:
+            if not self._count:
+                return None
+            if self._weighted is None:
+                self._reweight()
+            weighted_query = query * self._idf
+            norm = float(np.linalg.norm(weighted_query))
+            if not norm:
+                return None
+            scores = self._weighted @ (weighted_query / norm)
+            slot = int(np.argmax(scores))
+            similarity = float(scores[slot])
+            if similarity < self.min_similarity or self._entries[slot] is None:
+                return None
+            neighbor_prompt, result = self._entries[slot]
+            return Neighbor(neighbor_prompt, copy.deepcopy(result), similarity)
+
+    def _reweight(self):
+        """Recompute IDF weights and the normalized matrix after the index changed"""
+        documents = self._count
+        self._idf = (np.log((1 + documents) / (1 + self._df)) + 1).astype(np.float32)
+        # Slots fill in order, so only the first ``documents`` rows are in use
+        weighted = self._tf[:documents] * self._idf
+        norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._weighted = weighted / norms
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "memory_mb": round((self._tf.nbytes + self._df.nbytes) / 1024 / 1024, 1),
+        }
@@ -0,0 +1,153 @@
+"""Two-tier cache for AI extraction responses (in-process LRU + SQLite on disk)"""
+
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so trivially re-formatted prompts share a cache entry"""
+    return " ".join(prompt.split())
+
+
+def schema_fingerprint(field_schemas: Dict[str, Any]) -> str:
+    """Stable hash of the field schemas; changes whenever a field or option changes"""
+    payload = json.dumps(field_schemas, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def make_cache_key(prompt: str, schema_hash: str, model_params: Dict[str, Any]) -> str:
+    """Build the cache key from the normalized prompt, schema hash and model parameters"""
+    payload = json.dumps(
+        {"prompt": normalize_prompt(prompt), "schema": schema_hash, "params": model_params},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Response cache shared by all sessions of the process.
+
+    Lookups hit a bounded in-memory LRU first and fall back to an optional
+    SQLite file. Disk entries expire after ``ttl_seconds`` and the least
+    recently used rows are evicted once ``max_disk_entries`` is exceeded.
+    Entries written under a different schema hash are purged on open.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str],
+        schema_hash: str,
+        max_memory_entries: int = 256,
+        max_disk_entries: int = 5000,
+        ttl_seconds: float = 7 * 24 * 3600,
+    ):
+        self.schema_hash = schema_hash
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        self._db = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    schema_hash TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+            self._db.execute("DELETE FROM responses WHERE schema_hash != ?", (schema_hash,))
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached response for ``key`` or None on a miss"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return copy.deepcopy(self._memory[key])
+
+            if self._db is not None:
+                now = time.time()
+                row = self._db.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] <= self.ttl_seconds:
+                    self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    value = json.loads(row[0])
+                    self._remember(key, copy.deepcopy(value))
+                    self._stats["disk_hits"] += 1
+                    return value
+                if row:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a response in both tiers, evicting expired and surplus disk rows"""
+        with self._lock:
+            self._remember(key, copy.deepcopy(value))
+            self._stats["writes"] += 1
+
+            if self._db is not None:
+                now = time.time()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, schema_hash, value, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, self.schema_hash, json.dumps(value), now, now),
+                )
+                expired = self._db.execute(
+                    "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+                ).rowcount
+                surplus = self._db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                ).rowcount
+                self._stats["evictions"] += expired + surplus
+                self._db.commit()
+
+    def clear(self) -> None:
+        """Drop every cached response from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters plus the current size of each tier"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = (
+                self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self._db is not None else 0
+            )
+            return stats
+
+    def _remember(self, key: str, value: Dict[str, Any]) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
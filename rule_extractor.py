@@ -0,0 +1,402 @@
+"""Deterministic pre-extraction of easy fields before the prompt reaches the model"""
+
+import re
+from collections import Counter, defaultdict
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "for", "with", "on", "in", "at", "by", "from", "as",
+    "is", "are", "be", "it", "its", "this", "that", "our", "we", "will", "should", "would", "please",
+    "all", "also", "into", "per", "each", "only", "but", "while", "then", "so", "not", "no", "yes",
+}
+
+# A clause with one of these says what a field is not; its values are left to the model
+NEGATION_WORDS = {"no", "not", "without", "except", "waive", "waived", "none"}
+
+# Verbs and nouns that describe the request rather than a field value
+FILLER_WORDS = {
+    "create", "new", "make", "set", "setup", "up", "launch", "launching", "start", "starting",
+    "offer", "offering", "add", "update", "change", "changes", "modify", "enable", "enabled",
+    "program", "card", "product", "target", "targeting", "have", "has", "include", "including",
+    "called", "named", "code", "fee", "rate", "using", "use", "effective",
+}
+
+# Abbreviations mapped onto the words used in field labels
+SYNONYMS = {"min": "minimum", "max": "maximum", "apr": "interest", "dti": "debt", "launches": "launch"}
+
+MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3, "apr": 4, "april": 4,
+    "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7, "aug": 8, "august": 8, "sep": 9, "sept": 9,
+    "september": 9, "oct": 10, "october": 10, "nov": 11, "november": 11, "dec": 12, "december": 12,
+}
+_MONTH = r"(?P<month>jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sept?(?:ember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?"
+
+DATE_PATTERNS = [
+    re.compile(r"\b(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})\b"),
+    re.compile(r"\b(?P<month>\d{1,2})/(?P<day>\d{1,2})/(?P<year>\d{4})\b"),
+    re.compile(rf"\b{_MONTH}\s+(?P<day>\d{{1,2}})(?:st|nd|rd|th)?,?\s+(?P<year>\d{{4}})\b", re.IGNORECASE),
+    re.compile(rf"\b(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?{_MONTH},?\s+(?P<year>\d{{4}})\b", re.IGNORECASE),
+]
+TIME_PATTERNS = [
+    re.compile(r"\b(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?(?::(?P<second>\d{2}))?\s*(?P<ampm>[ap])\.?m\.?(?![a-z])", re.IGNORECASE),
+    re.compile(r"\b(?P<hour>\d{1,2}):(?P<minute>\d{2})(?::(?P<second>\d{2}))?\b"),
+]
+MONEY_PATTERNS = [
+    re.compile(r"\$\s?(?P<amount>(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?)\s*(?P<scale>k|m|mm|million|thousand|bn|billion)?\b", re.IGNORECASE),
+    re.compile(r"\b(?P<amount>(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?)\s*(?P<scale>k|m|million|thousand)?\s*(?:usd|dollars)\b", re.IGNORECASE),
+]
+PERCENT_PATTERN = re.compile(r"\b(?P<amount>\d+(?:\.\d+)?)\s*(?:%|percent\b|pct\b)", re.IGNORECASE)
+DURATION_PATTERN = re.compile(r"\b(?P<amount>\d+)\s*-?\s*(?P<unit>months?|mos?|years?|yrs?)\b", re.IGNORECASE)
+CODE_PATTERN = re.compile(r"\b(?=[A-Z0-9-]*\d)(?=[A-Z0-9-]*[A-Z])[A-Z0-9]+(?:-[A-Z0-9]+)*\b")
+NUMBER_PATTERN = re.compile(r"\b\d+(?:\.\d+)?\b")
+CLAUSE_BOUNDARY = re.compile(r"[,;:\n]|\.(?:\s|$)|\b(?:and|with|but|while|plus)\b", re.IGNORECASE)
+WORD_PATTERN = re.compile(r"[A-Za-z0-9]+")
+
+SCALES = {"k": 1_000, "thousand": 1_000, "m": 1_000_000, "mm": 1_000_000, "million": 1_000_000,
+          "bn": 1_000_000_000, "billion": 1_000_000_000}
+
+
+def normalize_token(token: str) -> str:
+    """Lower-case, map abbreviations and strip plural endings"""
+    token = token.lower()
+    token = SYNONYMS.get(token, token)
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        token = token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [normalize_token(token) for token in WORD_PATTERN.findall(text)]
+
+
+def stem(token: str) -> str:
+    """First letters of a token, so reworded words match ("renews"/"renewal", "retirees"/"retired")"""
+    return token[:5]
+
+
+def _number(value: float) -> Any:
+    return int(value) if float(value).is_integer() else value
+
+
+def _parse_date(match) -> Optional[str]:
+    parts = match.groupdict()
+    month = parts["month"]
+    month = int(month) if month.isdigit() else MONTHS.get(month.lower().rstrip("."))
+    try:
+        return date(int(parts["year"]), month, int(parts["day"])).isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_time(match) -> Optional[str]:
+    parts = match.groupdict()
+    hour = int(parts["hour"])
+    minute = int(parts["minute"] or 0)
+    second = int(parts["second"] or 0)
+    ampm = (parts.get("ampm") or "").lower()
+    if ampm:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if ampm == "p" else 0)
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+    return f"{hour:02d}:{minute:02d}:{second:02d}"
+
+
+def _parse_money(match) -> Optional[Any]:
+    amount = float(match.group("amount").replace(",", ""))
+    scale = (match.group("scale") or "").lower()
+    return _number(amount * SCALES.get(scale, 1))
+
+
+def _parse_percent(match) -> Optional[Any]:
+    return _number(float(match.group("amount")))
+
+
+def _parse_duration(match) -> Optional[Any]:
+    amount = int(match.group("amount"))
+    return amount * 12 if match.group("unit").lower().startswith("y") else amount
+
+
+def mask_values(text: str) -> Tuple[str, List[Tuple[str, Any, int]]]:
+    """Find the typed values in ``text`` and blank out their spans.
+
+    Returns the masked text (same length, so positions still match) and
+    ``(kind, value, position)`` for every value. Dates come before plain
+    numbers, amounts before percentages, and so on.
+    """
+    masked = list(text)
+    values: List[Tuple[str, Any, int]] = []
+
+    def take(pattern, kind, parse):
+        for match in pattern.finditer("".join(masked)):
+            value = parse(match)
+            if value is None:
+                continue
+            values.append((kind, value, match.start()))
+            masked[match.start():match.end()] = " " * (match.end() - match.start())
+
+    for pattern in DATE_PATTERNS:
+        take(pattern, "date", _parse_date)
+    for pattern in TIME_PATTERNS:
+        take(pattern, "time", _parse_time)
+    for pattern in MONEY_PATTERNS:
+        take(pattern, "money", _parse_money)
+    take(PERCENT_PATTERN, "percent", _parse_percent)
+    take(DURATION_PATTERN, "duration", _parse_duration)
+    take(CODE_PATTERN, "code", lambda match: match.group(0))
+    take(NUMBER_PATTERN, "number", lambda match: _number(float(match.group(0))))
+    return "".join(masked), values
+
+
+def split_clauses(text: str) -> Dict[str, str]:
+    """Clauses of a prompt keyed by their normalized tokens, for comparing two prompts
+
+    Boundaries are found with the values masked, so "Aug 1, 2025" and
+    "$10,000" stay inside their clause.
+    """
+    masked, _ = mask_values(text)
+    clauses = {}
+    start = 0
+    for boundary in [*CLAUSE_BOUNDARY.finditer(masked), None]:
+        end = boundary.start() if boundary else len(text)
+        piece = text[start:end]
+        key = " ".join(tokenize(piece))
+        if key:
+            clauses.setdefault(key, piece.strip())
+        start = boundary.end() if boundary else end
+    return clauses
+
+
+def _option_tokens(option: str) -> List[str]:
+    # "Good (670-739)" is matched on "Good"; the bracketed range is only a hint
+    return tokenize(re.sub(r"\(.*?\)", " ", option))
+
+
+class RuleExtractor:
+    """Fills fields that can be read straight off the prompt.
+
+    Everything it needs is derived once from the field schemas: an index of
+    option phrases by first token, the label tokens of each field (weighted by
+    how rare they are across labels) and the fields each value kind can go to.
+    ``extract`` then finds dates, times, money amounts, percentages,
+    durations, program codes and option labels, assigns each to the field
+    whose label words appear in the same clause, and reports whether anything
+    in the prompt was left over for the model. Clauses with a negation ("no
+    annual fee", "status not active") are never resolved by the rules.
+    """
+
+    def __init__(self, field_schemas: Dict[str, Dict]):
+        self.fields = {
+            field_name: field_info
+            for page_fields in field_schemas.values()
+            for field_name, field_info in page_fields.items()
+        }
+
+        self.label_tokens = {
+            field_name: set(tokenize(re.sub(r"\(.*?\)", " ", info["label"]))) - STOPWORDS
+            for field_name, info in self.fields.items()
+        }
+        document_frequency = Counter(token for tokens in self.label_tokens.values() for token in tokens)
+        self.token_weights = {token: 1.0 / count for token, count in document_frequency.items()}
+
+        # Option phrases indexed by their first token; money-like options (e.g. "$5,000")
+        # are matched through the money parser instead
+        self.option_index: Dict[str, List[Tuple[Tuple[str, ...], str, str]]] = defaultdict(list)
+        self.money_options: Dict[str, Dict[Any, str]] = {}
+        for field_name, info in self.fields.items():
+            for option in info.get("options", []):
+                if "$" in option:
+                    amount = re.sub(r"[^\d.]", "", option)
+                    if amount:
+                        self.money_options.setdefault(field_name, {})[_number(float(amount))] = option
+                    continue
+                tokens = tuple(_option_tokens(option))
+                if tokens:
+                    self.option_index[tokens[0]].append((tokens, field_name, option))
+        for candidates in self.option_index.values():
+            candidates.sort(key=lambda candidate: -len(candidate[0]))
+
+        def fields_where(predicate) -> List[str]:
+            return [name for name, info in self.fields.items() if predicate(info)]
+
+        self.candidates = {
+            "date": fields_where(lambda info: info["type"] == "date"),
+            "time": fields_where(lambda info: info["type"] == "time"),
+            "money": fields_where(lambda info: info["type"] == "number" and "$" in info["label"])
+            + list(self.money_options),
+            "percent": fields_where(lambda info: info["type"] in ("number", "slider") and "%" in info["label"]),
+            "duration": fields_where(
+                lambda info: info["type"] in ("number", "slider") and "month" in info["label"].lower()
+            ),
+            "code": fields_where(lambda info: info["type"] == "text" and "code" in info["label"].lower()),
+            "number": fields_where(lambda info: info["type"] in ("number", "slider")),
+        }
+        # Label words only count as covered once their field is filled, see extract
+        self.ignorable_tokens = STOPWORDS | FILLER_WORDS
+        self.option_tokens = {
+            field_name: {
+                token for option in info.get("options", []) for token in _option_tokens(option)
+            } - STOPWORDS - FILLER_WORDS
+            for field_name, info in self.fields.items()
+        }
+        self.kind_patterns = {
+            "date": DATE_PATTERNS,
+            "time": TIME_PATTERNS,
+            "money": MONEY_PATTERNS,
+            "percent": [PERCENT_PATTERN],
+            "duration": [DURATION_PATTERN],
+            "code": [CODE_PATTERN],
+        }
+
+    def extract(self, prompt: str) -> Dict[str, Any]:
+        """Extract what the rules can resolve.
+
+        Returns ``supported_fields`` (same value formats as the model uses),
+        ``unresolved_fields`` (every field the rules did not fill completely),
+        ``partial_fields`` (multiselects in ``supported_fields`` whose other
+        option words are still in the prompt, so the model may add options)
+        and ``covered``, which is True when nothing in the prompt is left for
+        the model to interpret.
+        """
+        text, values = mask_values(prompt)
+        masked = list(text)
+
+        # Split into clauses; value spans are already masked, so commas inside
+        # "Aug 1, 2025" or "$10,000" do not count as boundaries
+        boundaries = [match.start() for match in CLAUSE_BOUNDARY.finditer(text)]
+        clause_starts = [0] + [position + 1 for position in boundaries]
+        clause_ends = boundaries + [len(text)]
+
+        def clause_of(position: int) -> int:
+            return sum(1 for boundary in boundaries if boundary < position)
+
+        clause_tokens = [set(tokenize(text[start:end])) for start, end in zip(clause_starts, clause_ends)]
+        negated = {index for index, tokens in enumerate(clause_tokens) if tokens & NEGATION_WORDS}
+
+        assignments: Dict[str, List[Any]] = defaultdict(list)
+        unassigned = 0
+
+        # Option labels
+        words = [(normalize_token(match.group(0)), match.start(), match.end()) for match in WORD_PATTERN.finditer(text)]
+        matched_spans = []
+        i = 0
+        while i < len(words):
+            matched = False
+            for tokens, field_name, option in self.option_index.get(words[i][0], []):
+                window = words[i:i + len(tokens)]
+                if tuple(word for word, _, _ in window) != tokens:
+                    continue
+                clause = clause_of(words[i][1])
+                if clause in negated:
+                    break
+                # Single-word options ("Active", "Points") also need a label word nearby
+                if len(tokens) == 1 and not self._label_score(field_name, clause_tokens[clause], strong_only=True):
+                    continue
+                assignments[field_name].append(option)
+                matched_spans.append((window[0][1], window[-1][2]))
+                i += len(tokens)
+                matched = True
+                break
+            if not matched:
+                i += 1
+
+        # Typed values go to the compatible field whose label words share the clause
+        for kind, value, position in values:
+            clause = clause_of(position)
+            field_name = None if clause in negated else self._best_field(kind, value, clause_tokens[clause])
+            if field_name is None:
+                unassigned += 1
+                continue
+            if field_name in self.money_options:
+                value = self.money_options[field_name][value]
+            assignments[field_name].append(value)
+
+        supported_fields = {}
+        for field_name, found in assignments.items():
+            if self.fields[field_name]["type"] == "multiselect":
+                options = self.fields[field_name]["options"]
+                supported_fields[field_name] = [option for option in options if option in found]
+            elif len(set(map(str, found))) == 1:
+                supported_fields[field_name] = found[0]
+            # Conflicting values for one field are left to the model
+
+        for start, end in matched_spans:
+            masked[start:end] = " " * (end - start)
+        # A label word of a field the rules did not fill ("auto renewal") is left for the model
+        ignorable = self.ignorable_tokens.union(*(self.label_tokens[name] for name in supported_fields))
+        leftover = {token for token in tokenize("".join(masked)) if token not in ignorable}
+        partial = [
+            field_name for field_name, value in supported_fields.items()
+            if self.fields[field_name]["type"] == "multiselect" and self.option_tokens[field_name] & leftover
+        ]
+
+        return {
+            "supported_fields": supported_fields,
+            "unresolved_fields": [
+                name for name in self.fields if name not in supported_fields or name in partial
+            ],
+            "partial_fields": partial,
+            "covered": bool(supported_fields) and not leftover and not negated and unassigned == 0
+            and len(supported_fields) == len(assignments),
+        }
+
+    def relevant_fields(self, prompt: str, keep_text_fields: bool = True, match_values: bool = True) -> List[str]:
+        """Fields the prompt plausibly talks about.
+
+        A field is relevant when a distinctive word of its label or one of its
+        option words appears in the prompt (compared by stem, so "renews"
+        still names "Auto Renewal"), or when the prompt contains a value of a
+        kind the field accepts (a date, an amount, ...). Short text fields
+        such as names are kept unless ``keep_text_fields`` is off, because they
+        are rarely named explicitly. With ``match_values`` off values do not
+        count, for when the rules have already placed them.
+        """
+        stems = {stem(token) for token in set(tokenize(prompt)) - STOPWORDS}
+        kinds = [
+            kind for kind, patterns in self.kind_patterns.items()
+            if match_values and any(pattern.search(prompt) for pattern in patterns)
+        ]
+        return [
+            field_name for field_name, info in self.fields.items()
+            if (keep_text_fields and info["type"] == "text")
+            or any(
+                stem(token) in stems and self.token_weights[token] >= 0.5 for token in self.label_tokens[field_name]
+            )
+            or any(stem(token) in stems for token in self.option_tokens[field_name])
+            or any(field_name in self.candidates[kind] for kind in kinds)
+        ]
+
+    def _label_score(self, field_name: str, tokens: set, strong_only: bool = False) -> float:
+        return sum(
+            self.token_weights[token]
+            for token in self.label_tokens[field_name] & tokens
+            if not strong_only or self.token_weights[token] >= 0.5
+        )
+
+    def _best_field(self, kind: str, value: Any, tokens: set) -> Optional[str]:
+        candidates = list(self.candidates[kind])
+        if kind == "money":
+            candidates = [
+                name for name in candidates if name not in self.money_options or value in self.money_options[name]
+            ]
+        candidates = [name for name in candidates if self._in_bounds(name, value)]
+        if not candidates:
+            return None
+
+        scored = sorted(((self._label_score(name, tokens), name) for name in candidates), reverse=True)
+        best_score, best_field = scored[0]
+        if best_score == 0:
+            # Without label words only an unambiguous kind (e.g. the one date field) is safe;
+            # bare numbers always need a label word
+            return best_field if len(candidates) == 1 and kind != "number" else None
+        if len(scored) > 1 and scored[1][0] == best_score:
+            return None
+        return best_field
+
+    def _in_bounds(self, field_name: str, value: Any) -> bool:
+        info = self.fields[field_name]
+        if info["type"] != "slider" or not isinstance(value, (int, float)):
+            return True
+        return info.get("min", 0) <= value <= info.get("max", 100)
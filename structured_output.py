@@ -0,0 +1,156 @@
+"""JSON Schema for structured model output, plus local repair of malformed replies"""
+
+import json
+import re
+from typing import Any, Dict, Optional
+
+FORM_TOOL_NAME = "fill_form"
+
+# HH:MM or HH:MM:SS, the formats field validation accepts
+TIME_PATTERN = r"^([01][0-9]|2[0-3]):[0-5][0-9](:[0-5][0-9])?$"
+
+_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def field_json_schema(field_name: str, field_info: Dict) -> Dict[str, Any]:
+    """JSON Schema for a single field value"""
+    field_type = field_info["type"]
+
+    if field_type == "number":
+        schema = {"type": "number"}
+    elif field_type == "slider":
+        bounds = (field_info.get("min", 0), field_info.get("max", 100), field_info.get("step", 1))
+        schema = {
+            "type": "integer" if all(isinstance(bound, int) for bound in bounds) else "number",
+            "minimum": field_info.get("min", 0),
+            "maximum": field_info.get("max", 100),
+        }
+    elif field_type == "checkbox":
+        schema = {"type": "boolean"}
+    elif field_type == "date":
+        schema = {"type": "string", "format": "date"}
+    elif field_type == "time":
+        # Not "format": "time", which is RFC 3339 full-time and requires a UTC offset
+        schema = {"type": "string", "pattern": TIME_PATTERN}
+    elif field_type in ("select", "radio"):
+        schema = {"type": "string", "enum": list(field_info["options"])}
+    elif field_type == "multiselect":
+        schema = {"type": "array", "items": {"type": "string", "enum": list(field_info["options"])}, "uniqueItems": True}
+    else:
+        schema = {"type": "string"}
+
+    # The label is only worth its tokens when it says more than the field name
+    if field_info["label"].lower() != field_name.replace("_", " "):
+        schema["description"] = field_info["label"]
+    return schema
+
+
+def build_json_schema(field_schemas: Dict[str, Dict]) -> Dict[str, Any]:
+    """JSON Schema of the full reply (``supported_fields`` + ``unsupported_fields``)"""
+    properties = {
+        field_name: field_json_schema(field_name, field_info)
+        for page_fields in field_schemas.values()
+        for field_name, field_info in page_fields.items()
+    }
+    return {
+        "type": "object",
+        "properties": {
+            "supported_fields": {
+                "type": "object",
+                "description": "Values for the fields that can be inferred from the prompt",
+                "properties": properties,
+                "additionalProperties": False,
+            },
+            "unsupported_fields": {
+                "type": "array",
+                "description": "Things the prompt asks for that match none of the fields",
+                "items": {"type": "string"},
+            },
+        },
+        "required": ["supported_fields", "unsupported_fields"],
+        "additionalProperties": False,
+    }
+
+
+def repair_json(text: str) -> Optional[Dict[str, Any]]:
+    """Recover a JSON object from a reply that is wrapped, malformed or cut off.
+
+    Handles code fences and surrounding prose, trailing commas and truncated
+    output. Truncated replies are cut back to the last complete member and
+    the open arrays and objects are closed. Returns None when nothing can be
+    recovered.
+    """
+    text = _FENCE.sub("", text)
+    start = text.find("{")
+    if start == -1:
+        return None
+    text = text[start:]
+
+    decoder = json.JSONDecoder()
+    for candidate in (text, _TRAILING_COMMA.sub(r"\1", text)):
+        try:
+            value, _ = decoder.raw_decode(candidate)
+            return value if isinstance(value, dict) else None
+        except ValueError:
+            pass
+
+    # Walk the text, remembering every point where the open containers could be closed
+    stack = []
+    in_string = False
+    escape = False
+    cut_points = []
+    for i, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+            cut_points.append((i + 1, "".join(reversed(stack))))
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            cut_points.append((i + 1, "".join(reversed(stack))))
+        elif char == ",":
+            cut_points.append((i, "".join(reversed(stack))))
+
+    # Close everything as is, then fall back to earlier cut points. A value cut
+    # off mid-string, or a number or literal at the very end ("5" may have been
+    # 500), is dropped rather than kept half-written
+    tail = text.rstrip()
+    complete = not in_string and (tail.endswith(",") or tail[-1:] in '"{}[]')
+    candidates = [tail.rstrip(",") + "".join(reversed(stack))] if complete else []
+    candidates.extend(text[:position] + closers for position, closers in reversed(cut_points[-50:]))
+
+    for candidate in candidates:
+        try:
+            value = json.loads(_TRAILING_COMMA.sub(r"\1", candidate))
+        except ValueError:
+            continue
+        if isinstance(value, dict):
+            return value
+    return None
+
+
+def parse_reply(text: str) -> Dict[str, Any]:
+    """Parse the model's reply, repairing it locally if needed; raises ValueError if unrecoverable"""
+    if not text:
+        # No content and no tool call
+        raise ValueError("Model reply is empty")
+    try:
+        value = json.loads(text)
+        if isinstance(value, dict):
+            return value
+    except ValueError:
+        pass
+    value = repair_json(text)
+    if value is None:
+        raise ValueError("Model reply is not valid JSON and could not be repaired")
+    return value
@@ -0,0 +1,277 @@
+"""Persistent store of submitted programs (SQLite in WAL mode) with search, paging and streaming export.
+
+Export from the command line, while the app keeps running:
+    python submission_store.py --format csv -o programs.csv
+    python submission_store.py --format jsonl --status Active --launched-from 2025-01-01
+"""
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date, datetime, time as dt_time
+from typing import Any, Dict, IO, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+# Form fields copied into their own indexed columns
+INDEXED_FIELDS = ("program_code", "program_name", "program_status", "launch_date")
+
+
+class SubmissionSummary(NamedTuple):
+    id: int
+    submitted_at: float
+    program_code: Optional[str]
+    program_name: Optional[str]
+    program_status: Optional[str]
+    launch_date: Optional[str]
+
+
+def json_value(value: Any) -> Any:
+    """JSON-friendly form of a widget value (dates and times as ISO strings)"""
+    if isinstance(value, (date, datetime, dt_time)):
+        return value.isoformat()
+    if isinstance(value, tuple):
+        return list(value)
+    return value
+
+
+def _like_pattern(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class SubmissionStore:
+    """Submitted programs, shared by all sessions of the process.
+
+    Every submission is a new row holding its form data and unsupported
+    fields as JSON, plus indexed copies of the program code, name, status
+    and launch date for search. Lists are paged by id (newest first) with
+    a cursor, so later pages cost the same as the first, and exports read
+    the table in id-ordered batches instead of loading it whole. WAL mode
+    lets other processes (e.g. this module's export CLI) read while the
+    app writes.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self._lock = threading.Lock()
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS submissions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                submitted_at REAL NOT NULL,
+                schema_hash TEXT NOT NULL,
+                program_code TEXT,
+                program_name TEXT,
+                program_status TEXT,
+                launch_date TEXT,
+                form_data TEXT NOT NULL,
+                unsupported_fields TEXT NOT NULL
+            )"""
+        )
+        for column in ("program_code", "program_status", "launch_date"):
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS idx_submissions_{column} ON submissions ({column})")
+        self._db.commit()
+
+    def save(self, form_data: Dict[str, Any], unsupported_fields: Sequence[str] = (), schema_hash: str = "") -> int:
+        """Store a submission made under the schema version ``schema_hash`` and return its id"""
+        data = {name: json_value(value) for name, value in form_data.items()}
+        indexed = [None if data.get(name) in (None, "") else str(data[name]) for name in INDEXED_FIELDS]
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO submissions (submitted_at, schema_hash, program_code, program_name, program_status, "
+                "launch_date, form_data, unsupported_fields) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), schema_hash, *indexed, json.dumps(data), json.dumps(list(unsupported_fields))),
+            )
+            self._db.commit()
+            return cursor.lastrowid
+
+    def get(self, submission_id: int) -> Optional[Dict[str, Any]]:
+        """A submission with its full form data, or None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, submitted_at, schema_hash, form_data, unsupported_fields FROM submissions WHERE id = ?",
+                (submission_id,),
+            ).fetchone()
+        return None if row is None else self._row_to_dict(row)
+
+    def search(
+        self,
+        text: Optional[str] = None,
+        status: Optional[str] = None,
+        program_code: Optional[str] = None,
+        launched_from: Optional[str] = None,
+        launched_to: Optional[str] = None,
+        before_id: Optional[int] = None,
+        limit: int = 20,
+    ) -> List[SubmissionSummary]:
+        """Newest matching submissions first; pass the last id seen as ``before_id`` for the next page.
+
+        ``text`` matches anywhere in the program code or name, the other
+        filters are exact (``launched_from``/``launched_to`` are inclusive ISO
+        dates) and use the indexes.
+        """
+        where, params = self._where(text, status, program_code, launched_from, launched_to)
+        if before_id is not None:
+            where.append("id < ?")
+            params.append(before_id)
+        sql = "SELECT id, submitted_at, " + ", ".join(INDEXED_FIELDS) + " FROM submissions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            rows = self._db.execute(sql + " ORDER BY id DESC LIMIT ?", (*params, limit)).fetchall()
+        return [SubmissionSummary(*row) for row in rows]
+
+    def count(
+        self,
+        text: Optional[str] = None,
+        status: Optional[str] = None,
+        program_code: Optional[str] = None,
+        launched_from: Optional[str] = None,
+        launched_to: Optional[str] = None,
+    ) -> int:
+        where, params = self._where(text, status, program_code, launched_from, launched_to)
+        sql = "SELECT COUNT(*) FROM submissions" + (" WHERE " + " AND ".join(where) if where else "")
+        with self._lock:
+            return self._db.execute(sql, params).fetchone()[0]
+
+    def iter_submissions(self, batch_size: int = 500, **filters: Optional[str]) -> Iterator[Dict[str, Any]]:
+        """Every matching submission in id order, read ``batch_size`` rows at a time"""
+        where, params = self._where(**filters)
+        last_id = 0
+        while True:
+            sql = "SELECT id, submitted_at, schema_hash, form_data, unsupported_fields FROM submissions WHERE " + (
+                " AND ".join(where + ["id > ?"])
+            )
+            with self._lock:
+                rows = self._db.execute(sql + " ORDER BY id LIMIT ?", (*params, last_id, batch_size)).fetchall()
+            for row in rows:
+                yield self._row_to_dict(row)
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
+
+    def export_jsonl(self, handle: IO[str], **filters: Optional[str]) -> int:
+        """Write matching submissions as JSON lines; returns the number written"""
+        written = 0
+        for submission in self.iter_submissions(**filters):
+            handle.write(json.dumps(submission) + "\n")
+            written += 1
+        return written
+
+    def export_csv(self, handle: IO[str], field_names: Sequence[str], **filters: Optional[str]) -> int:
+        """Write matching submissions as CSV, one column per field; returns the number written"""
+        writer = csv.writer(handle)
+        writer.writerow(["id", "submitted_at", *field_names, "unsupported_fields"])
+        written = 0
+        for submission in self.iter_submissions(**filters):
+            form_data = submission["form_data"]
+            writer.writerow([
+                submission["id"],
+                datetime.fromtimestamp(submission["submitted_at"]).isoformat(timespec="seconds"),
+                *(self._csv_value(form_data.get(name)) for name in field_names),
+                ", ".join(submission["unsupported_fields"]),
+            ])
+            written += 1
+        return written
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def _where(
+        text: Optional[str] = None,
+        status: Optional[str] = None,
+        program_code: Optional[str] = None,
+        launched_from: Optional[str] = None,
+        launched_to: Optional[str] = None,
+    ) -> Tuple[List[str], List[Any]]:
+        where: List[str] = []
+        params: List[Any] = []
+        if text:
+            where.append("(program_code LIKE ? ESCAPE '\\' OR program_name LIKE ? ESCAPE '\\')")
+            params += [_like_pattern(text)] * 2
+        for column, value in (("program_status", status), ("program_code", program_code)):
+            if value:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if launched_from:
+            where.append("launch_date >= ?")
+            params.append(launched_from)
+        if launched_to:
+            where.append("launch_date <= ?")
+            params.append(launched_to)
+        return where, params
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict[str, Any]:
+        return {
+            "id": row[0],
+            "submitted_at": row[1],
+            "schema_hash": row[2],
+            "form_data": json.loads(row[3]),
+            "unsupported_fields": json.loads(row[4]),
+        }
+
+    @staticmethod
+    def _csv_value(value: Any) -> Any:
+        if value is None:
+            return ""
+        if isinstance(value, list):
+            return ", ".join(str(item) for item in value)
+        return value
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export submitted programs as CSV or JSONL.")
+    parser.add_argument("--path", default=os.getenv("SUBMISSIONS_PATH") or ".data/submissions.sqlite3")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="jsonl")
+    parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    parser.add_argument("--search", help="text in the program code or name")
+    parser.add_argument("--status", help="exact program status")
+    parser.add_argument("--code", help="exact program code")
+    parser.add_argument("--launched-from", help="earliest launch date (YYYY-MM-DD)")
+    parser.add_argument("--launched-to", help="latest launch date (YYYY-MM-DD)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not os.path.exists(args.path):
+        print(f"No submissions at {args.path}", file=sys.stderr)
+        return 1
+    store = SubmissionStore(args.path)
+    filters = {
+        "text": args.search,
+        "status": args.status,
+        "program_code": args.code,
+        "launched_from": args.launched_from,
+        "launched_to": args.launched_to,
+    }
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        if args.format == "csv":
+            from field_schemas import ALL_FIELDS
+            written = store.export_csv(output, list(ALL_FIELDS), **filters)
+        else:
+            written = store.export_jsonl(output, **filters)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        store.close()
+    print(f"Exported {written} submissions", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import openai
+
+from batch_extract import RateLimitGate, extract_record
+from extractor import ExtractionError
+
+
+class RateLimitedExtractor:
+    """Answers 429 with Retry-After to the first request, then succeeds; records when requests were sent"""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        self.sent = []
+
+    async def aextract(self, prompt):
+        self.sent.append(time.monotonic())
+        if len(self.sent) == 1:
+            response = SimpleNamespace(
+                request=None, status_code=429, headers={"retry-after": str(self.retry_after)}
+            )
+            cause = openai.RateLimitError("rate limited", response=response, body=None)
+            raise ExtractionError("rate limited", {"supported_fields": {}}) from cause
+        await asyncio.sleep(0.01)
+        return {"supported_fields": {"annual_fee": 75}, "unsupported_fields": []}
+
+
+def test_rate_limit_pauses_every_record_sharing_the_gate():
+    extractor = RateLimitedExtractor(retry_after=0.3)
+
+    async def run():
+        gate = RateLimitGate()
+        first = asyncio.ensure_future(extract_record(extractor, {"id": 1, "prompt": "a"}, gate=gate))
+        await asyncio.sleep(0.05)
+        second = await extract_record(extractor, {"id": 2, "prompt": "b"}, gate=gate)
+        return await first, second
+
+    started = time.monotonic()
+    first, second = asyncio.run(run())
+    assert first["attempts"] == 2 and second["attempts"] == 1
+    assert first["form_data"] == second["form_data"] == {"annual_fee": 75}
+    # The other record waited out the Retry-After delay instead of sending right away
+    assert all(sent - started >= 0.28 for sent in extractor.sent[1:])
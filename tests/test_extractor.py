@@ -0,0 +1,52 @@
+from extractor import FieldExtractor, followup_instruction
+from field_schemas import FIELD_SCHEMAS
+from rule_extractor import RuleExtractor
+
+PROMPT = "Gold Card program ABC123, with $50 annual fee, 15% interest rate, and a brushed metal design"
+
+
+def test_partial_multiselect_is_combined_with_the_model_reply():
+    extractor = FieldExtractor(FIELD_SCHEMAS, api_key="sk-test")
+    merged = extractor._merge(
+        {"rewards_program": ["Miles"], "annual_fee": 95},
+        {"supported_fields": {"rewards_program": ["Points"], "annual_fee": 75}, "unsupported_fields": []},
+    )
+    assert merged["supported_fields"] == {"rewards_program": ["Points", "Miles"], "annual_fee": 95}
+
+
+def test_edited_value_is_sent_without_the_old_clause():
+    rules = RuleExtractor(FIELD_SCHEMAS)
+    assert followup_instruction(PROMPT, PROMPT.replace("$50", "$75"), rules) == "$75 annual fee"
+    assert followup_instruction(PROMPT, PROMPT.replace(", 15% interest rate", ""), rules) == (
+        "No longer: 15% interest rate"
+    )
+
+
+def test_followup_rules_only_see_the_added_clauses():
+    extractor = FieldExtractor(FIELD_SCHEMAS, api_key="sk-test")
+    delta = extractor.extract_delta("$75 annual fee", {"annual_fee": 50, "program_code": "ABC123"})
+    assert delta == {"supported_fields": {"annual_fee": 75}, "unsupported_fields": []}
+
+
+def test_prompt_naming_no_field_asks_for_every_field():
+    extractor = FieldExtractor(FIELD_SCHEMAS, api_key="sk-test")
+    _, residual = extractor._pre_extract("runs for two years")
+    assert "program_duration" in residual
+    assert len(residual) == len(extractor.rules.fields)
+
+
+DATED_PROMPT = "Gold Card program ABC123, launch on Aug 1, 2025, with credit limit $10,000 and a $50 annual fee"
+
+
+def test_edited_date_is_sent_as_a_whole_clause():
+    rules = RuleExtractor(FIELD_SCHEMAS)
+    instruction = followup_instruction(DATED_PROMPT, DATED_PROMPT.replace("2025", "2026"), rules)
+    assert instruction == "launch on Aug 1, 2026"
+    delta = FieldExtractor(FIELD_SCHEMAS, api_key="sk-test").extract_delta(instruction, {"launch_date": "2025-08-01"})
+    assert delta["supported_fields"] == {"launch_date": "2026-08-01"}
+
+
+def test_edited_amount_with_thousands_separator_is_sent_whole():
+    rules = RuleExtractor(FIELD_SCHEMAS)
+    instruction = followup_instruction(DATED_PROMPT, DATED_PROMPT.replace("$10,000", "$25,000"), rules)
+    assert instruction == "credit limit $25,000"
@@ -0,0 +1,42 @@
+import json
+import os
+
+import pytest
+
+from form_schema import SchemaError, SchemaSource, parse_schema
+
+
+def document(page=None, **field):
+    field = {"name": "program_status", "type": "select", "label": "Status", "options": ["Draft", "Active"], **field}
+    field = {key: value for key, value in field.items() if value is not None}
+    return {"pages": [{"key": "basics", "fields": [field], **(page or {})}]}
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        document(page={"columns": "two"}),
+        document(page={"columns": 0}),
+        document(column="left"),
+        document(options="Draft"),
+        document(options=["Draft", 1]),
+        document(type="slider", options=None, min="1", max=10),
+        document(type="slider", options=None, min=1, max=10, step="1"),
+        document(type="number", options=None, step="0.5"),
+    ],
+)
+def test_wrongly_typed_settings_are_schema_errors(data):
+    with pytest.raises(SchemaError):
+        parse_schema(data, "test")
+
+
+def test_reload_keeps_the_previous_schema_when_the_new_one_is_invalid(tmp_path):
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps(document()))
+    source = SchemaSource(str(path), check_interval_s=0)
+    previous = source.current()
+
+    path.write_text(json.dumps(document(page={"columns": "two"})))
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+    assert source.current() is previous
+    assert "columns" in source.last_error
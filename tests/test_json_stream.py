@@ -0,0 +1,45 @@
+import json
+
+from json_stream import SupportedFieldsParser
+
+REPLY = json.dumps({
+    "supported_fields": {
+        "program_name": "Gold, \"Plus\" {edition}",
+        "annual_fee": 500,
+        "card_features": ["Contactless", "Mobile Wallet"],
+        "auto_renewal": True,
+    },
+    "unsupported_fields": ["lounge access"],
+})
+
+
+def feed_in_chunks(text, size):
+    parser = SupportedFieldsParser()
+    reported = []
+    for start in range(0, len(text), size):
+        reported.extend(parser.feed(text[start:start + size]).items())
+    return parser, reported
+
+
+def test_fields_are_reported_once_each_whatever_the_chunking():
+    expected = json.loads(REPLY)["supported_fields"]
+    for size in (1, 3, 7, len(REPLY)):
+        parser, reported = feed_in_chunks(REPLY, size)
+        assert dict(reported) == expected
+        assert [name for name, _ in reported] == list(expected)
+        assert parser.fields == expected
+        assert parser.text == REPLY
+
+
+def test_member_is_held_back_until_it_ends():
+    parser = SupportedFieldsParser()
+    assert parser.feed('{"supported_fields": {"annual_fee": 5') == {}
+    assert parser.feed("0") == {}
+    assert parser.feed(', "program_name": "Go') == {"annual_fee": 50}
+    assert parser.feed('ld"}') == {"program_name": "Gold"}
+
+
+def test_only_supported_fields_are_reported():
+    parser = SupportedFieldsParser()
+    reply = '{"unsupported_fields": ["x"], "meta": {"annual_fee": 1}, "supported_fields": {"annual_fee": 2}}'
+    assert parser.feed(reply) == {"annual_fee": 2}
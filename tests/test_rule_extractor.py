@@ -0,0 +1,103 @@
+import pytest
+
+from field_schemas import FIELD_SCHEMAS
+from rule_extractor import RuleExtractor
+
+
+@pytest.fixture(scope="module")
+def rules():
+    return RuleExtractor(FIELD_SCHEMAS)
+
+
+def test_resolves_typed_values_and_options(rules):
+    result = rules.extract("Gold card, status active, launch on 2025-08-01, annual fee $1,500.50")
+    assert result["supported_fields"] == {
+        "product_type": "Gold Card",
+        "program_status": "Active",
+        "launch_date": "2025-08-01",
+        "annual_fee": 1500.5,
+    }
+    assert result["covered"]
+
+
+@pytest.mark.parametrize(
+    "prompt, expected",
+    [
+        ("Annual fee $95, welcome bonus $200", {"annual_fee": 95, "welcome_bonus": 200}),
+        ("budget $500, fee $95", {"program_budget": 500, "annual_fee": 95}),
+        ("budget $10,000", {"program_budget": 10000}),
+    ],
+)
+def test_comma_after_amount_ends_the_clause(rules, prompt, expected):
+    result = rules.extract(prompt)
+    assert result["supported_fields"] == expected
+    assert result["covered"]
+
+
+def test_conflicting_values_are_left_to_the_model(rules):
+    result = rules.extract("annual fee $95 or annual fee $75")
+    assert "annual_fee" not in result["supported_fields"]
+    assert "annual_fee" in result["unresolved_fields"]
+    assert not result["covered"]
+
+
+@pytest.mark.parametrize(
+    "prompt, negated_field",
+    [
+        ("Gold card, status not active", "program_status"),
+        ("Gold card with no annual fee", "annual_fee"),
+        ("Gold card, no welcome bonus", "welcome_bonus"),
+        ("Gold card, annual fee waived", "annual_fee"),
+    ],
+)
+def test_negated_clauses_are_not_resolved(rules, prompt, negated_field):
+    result = rules.extract(prompt)
+    assert result["supported_fields"] == {"product_type": "Gold Card"}
+    assert negated_field in result["unresolved_fields"]
+    assert not result["covered"]
+
+
+@pytest.mark.parametrize(
+    "prompt, named_field",
+    [
+        ("Gold card with auto renewal", "auto_renewal"),
+        ("Gold card, activation required", "activation_required"),
+        ("Gold card, allow previous bankruptcy", "bankruptcy_allowed"),
+    ],
+)
+def test_fields_without_a_rule_are_left_to_the_model(rules, prompt, named_field):
+    result = rules.extract(prompt)
+    assert result["supported_fields"] == {"product_type": "Gold Card"}
+    assert named_field in result["unresolved_fields"]
+    assert not result["covered"]
+
+
+def test_partly_matched_multiselect_stays_unresolved(rules):
+    result = rules.extract("Points and miles rewards, contactless and chip & pin")
+    assert result["supported_fields"] == {"rewards_program": ["Miles"], "card_features": ["Chip & PIN"]}
+    assert set(result["partial_fields"]) == {"rewards_program", "card_features"}
+    assert {"rewards_program", "card_features"} <= set(result["unresolved_fields"])
+    assert not result["covered"]
+
+
+def test_fully_matched_multiselect_is_resolved(rules):
+    result = rules.extract("miles rewards and cash back rewards")
+    assert result["supported_fields"]["rewards_program"] == ["Cash Back", "Miles"]
+    assert result["partial_fields"] == []
+
+
+def test_relevant_fields_without_values(rules):
+    relevant = rules.relevant_fields("$75 annual fee", keep_text_fields=False, match_values=False)
+    assert relevant == ["annual_fee"]
+
+
+@pytest.mark.parametrize(
+    "prompt, field_name",
+    [
+        ("renews automatically every year", "auto_renewal"),
+        ("past bankruptcies are welcome", "bankruptcy_allowed"),
+        ("Aimed at retirees", "employment_status"),
+    ],
+)
+def test_reworded_fields_are_relevant(rules, prompt, field_name):
+    assert field_name in rules.relevant_fields(prompt)
@@ -0,0 +1,54 @@
+import re
+
+import pytest
+
+from field_validation import validate_value
+from model_tiers import parse_checked
+from structured_output import TIME_PATTERN, field_json_schema, repair_json
+
+
+@pytest.mark.parametrize("text", [None, ""])
+def test_empty_reply_is_a_value_error(text):
+    with pytest.raises(ValueError):
+        parse_checked(text)
+
+
+@pytest.mark.parametrize("value", ["09:30", "09:30:00", "23:59:59"])
+def test_time_schema_accepts_what_validation_accepts(value):
+    schema = field_json_schema("launch_time", {"type": "time", "label": "Launch Time"})
+    assert re.match(schema["pattern"], value)
+    validate_value({"type": "time", "label": "Launch Time"}, value)
+
+
+@pytest.mark.parametrize("value", ["09:30:00Z", "24:00", "9:30"])
+def test_time_schema_rejects_other_formats(value):
+    assert not re.match(TIME_PATTERN, value)
+
+
+@pytest.mark.parametrize(
+    "text, fields",
+    [
+        # Cut off inside a number or literal: the value may be longer, so it is dropped
+        ('{"supported_fields": {"program_name": "Gold", "annual_fee": 5', {"program_name": "Gold"}),
+        ('{"supported_fields": {"annual_fee": 50, "auto_renewal": tr', {"annual_fee": 50}),
+        # Cut off inside a string
+        ('{"supported_fields": {"annual_fee": 50, "program_name": "Go', {"annual_fee": 50}),
+        # Cut off after a complete value
+        ('{"supported_fields": {"annual_fee": 50, "program_name": "Gold"', {"annual_fee": 50, "program_name": "Gold"}),
+        ('{"supported_fields": {"annual_fee": 50,', {"annual_fee": 50}),
+        ('{"supported_fields": {"card_features": ["Contactless", "Mobile Wallet"', {
+            "card_features": ["Contactless", "Mobile Wallet"]
+        }),
+    ],
+)
+def test_truncated_reply_keeps_complete_members_only(text, fields):
+    assert repair_json(text) == {"supported_fields": fields}
+
+
+def test_wrapped_reply_with_trailing_comma_is_repaired():
+    text = 'Here you go:\n```json\n{"supported_fields": {"annual_fee": 50,}, "unsupported_fields": []}\n```'
+    assert repair_json(text) == {"supported_fields": {"annual_fee": 50}, "unsupported_fields": []}
+
+
+def test_reply_without_an_object_is_not_repaired():
+    assert repair_json("I cannot help with that") is None